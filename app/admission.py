@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+
+import aiohttp_jinja2
+from aiohttp import web
+from structlog import wrap_logger
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+LAUNCH_ROUTES = ('Index:post', 'WaitingRoom:post')
+
+
+class AdmissionController:
+    """
+    Sheds new launches while the worker is overloaded, so the requests it has already accepted still finish promptly.
+
+    The worker counts as overloaded once more than `max_in_flight` requests are being handled, or while the event loop
+    is waking up more than `max_loop_lag` seconds late. Loop lag is measured by a background task that sleeps for
+    `probe_interval` seconds at a time, and decays by `lag_decay` each probe so that one long stall keeps new launches
+    out for a little while. Only launch POSTs are shed: /info and the other pages are cheap and still served.
+    """
+
+    def __init__(self, max_in_flight: int, max_loop_lag: float, retry_after: int, probe_interval: float = 0.1,
+                 lag_decay: float = 0.9):
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.retry_after = retry_after
+        self.probe_interval = probe_interval
+        self.lag_decay = lag_decay
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self.shed = 0
+        self._probe = None
+
+    @property
+    def overloaded(self) -> bool:
+        return self.in_flight > self.max_in_flight or self.loop_lag > self.max_loop_lag
+
+    async def _measure_loop_lag(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.probe_interval)
+            lag = time.perf_counter() - start - self.probe_interval
+            self.loop_lag = max(lag, self.loop_lag * self.lag_decay, 0.0)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "loop_lag": self.loop_lag,
+            "shed": self.shed,
+        }
+
+    async def start(self, app):
+        self._probe = asyncio.ensure_future(self._measure_loop_lag())
+
+    async def stop(self, app):
+        if self._probe is not None:
+            self._probe.cancel()
+            try:
+                await self._probe
+            except asyncio.CancelledError:
+                pass
+            self._probe = None
+
+
+@web.middleware
+async def admission_middleware(request, handler):
+    controller = request.app.admission
+    controller.in_flight += 1
+    try:
+        resource = request.match_info.route.resource
+        if resource is not None and resource.name in LAUNCH_ROUTES and controller.overloaded:
+            controller.shed += 1
+            logger.warn('Shedding launch while overloaded', in_flight=controller.in_flight, loop_lag=controller.loop_lag)
+            request.app.metrics.launch_outcome('shed')
+            # NB: this runs ahead of the jinja2 context processors and error middleware, so nothing is loaded for it
+            response = aiohttp_jinja2.render_template("busy.html", request, {'request': request}, status=503)
+            response.headers['Retry-After'] = str(controller.retry_after)
+            return response
+        return await handler(request)
+    finally:
+        controller.in_flight -= 1
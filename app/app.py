@@ -2,24 +2,36 @@ import logging
 import types
 
 import aiohttp_jinja2
-import jinja2
-import redis
+import aioredis
 from aiohttp import BasicAuth, ClientSession, ClientTimeout
-from aiohttp.client_exceptions import ClientConnectionError, ClientConnectorError, ClientResponseError
 from aiohttp.web import Application
 from aiohttp_utils import negotiation, routing
 from structlog import wrap_logger
 
+from . import admission
+from . import cache
+from . import circuit_breaker
+from . import case_events
 from . import cloud
 from . import config
 from . import error_handlers
 from . import flash
 from . import google_analytics
+from . import handlers
+from . import health
 from . import jwt
+from . import maintenance
+from . import metrics
+from . import page_cache
+from . import rate_limit
 from . import routes
 from . import security
 from . import session
 from . import settings
+from . import template_cache
+from . import upstream
+from . import warmup
+from . import waiting_room
 from .app_logging import logger_initial_config
 
 
@@ -30,26 +42,23 @@ server_logger.setLevel("INFO")
 
 async def on_startup(app):
     app.http_session_pool = ClientSession(timeout=ClientTimeout(total=30))
-    app.redis_connection = redis.Redis(host=app['REDIS_HOST'], port=app['REDIS_PORT'])
+    # NB: minsize=0 so connections are only opened when first needed and the app can start without redis
+    app.redis_connection = await aioredis.create_redis_pool((app['REDIS_HOST'], app['REDIS_PORT']),
+                                                            minsize=0, maxsize=app['REDIS_POOL_MAXSIZE'],
+                                                            timeout=app['REDIS_TIMEOUT'])
 
 
 async def on_cleanup(app):
     await app.http_session_pool.close()
+    app.redis_connection.close()
+    await app.redis_connection.wait_closed()
 
 
 async def check_services(app: Application) -> bool:
-    for service_name in app.service_status_urls:
-        url = app.service_status_urls[service_name]
-        logger.info(f"Making health check GET request to {url}")
-        try:
-            async with app.http_session_pool.get(url) as resp:
-                resp.raise_for_status()
-        except (ClientConnectorError, ClientConnectionError, ClientResponseError):
-            logger.error('Failed to connect to required service', config=service_name, url=url)
-            return False
-    else:
+    await app.service_health.check()
+    if app.service_health.healthy:
         logger.info('All required services are healthy')
-        return True
+    return app.service_health.healthy
 
 
 def create_app(config_name=None) -> Application:
@@ -72,7 +81,9 @@ def create_app(config_name=None) -> Application:
     app = Application(
         debug=settings.DEBUG,
         middlewares=[
+            metrics.metrics_middleware,
             security.nonce_middleware,
+            admission.admission_middleware,
             session.setup(app_config["SECRET_KEY"]),
             flash.flash_middleware,
             flash.maintenance_middleware,
@@ -90,6 +101,83 @@ def create_app(config_name=None) -> Application:
     app.service_status_urls = app_config.get_service_urls_mapped_with_path(path='/info',
                                                                            excludes=['ACCOUNT_SERVICE_URL', 'EQ_URL'])
 
+    # Concurrent checks of the required services for /info?check, with the results reused for a few seconds
+    app.service_health = health.ServiceHealthCheck(app,
+                                                   urls=app.service_status_urls,
+                                                   timeout=app['HEALTH_CHECK_TIMEOUT'],
+                                                   cache_ttl=app['HEALTH_CHECK_CACHE_TTL'])
+
+    # Prometheus metrics served on /metrics
+    app.metrics = metrics.Metrics()
+
+    # GETs to the RM services, with identical in-flight requests sharing one response and a circuit breaker per service
+    # Each service also gets its own connection pool, and the services listed in UPSTREAM_HEDGE_SERVICES have slow GETs hedged
+    app.upstream = upstream.UpstreamClient(
+        app,
+        breakers=[
+            circuit_breaker.CircuitBreaker(service_url[:-len('_URL')].lower(), app[service_url],
+                                           failure_threshold=app['CIRCUIT_BREAKER_FAILURE_THRESHOLD'],
+                                           reset_timeout=app['CIRCUIT_BREAKER_RESET_TIMEOUT'])
+            for service_url in ('CASE_URL', 'IAC_URL', 'SAMPLE_URL', 'COLLECTION_EXERCISE_URL', 'COLLECTION_INSTRUMENT_URL')
+        ],
+        connector_options={
+            'limit': app['UPSTREAM_CONNECTION_LIMIT'],
+            'limit_per_host': app['UPSTREAM_LIMIT_PER_HOST'],
+            'keepalive_timeout': app['UPSTREAM_KEEPALIVE_TIMEOUT'],
+            'ttl_dns_cache': app['UPSTREAM_DNS_CACHE_TTL'],
+        },
+        resolve=upstream.parse_resolve(app['UPSTREAM_RESOLVE']),
+        hedges={
+            service.strip(): upstream.HedgePolicy(percentile=app['UPSTREAM_HEDGE_PERCENTILE'],
+                                                  max_rate=app['UPSTREAM_HEDGE_MAX_RATE'])
+            for service in app['UPSTREAM_HEDGE_SERVICES'].split(',') if service.strip()
+        })
+
+    # Cache of collection instrument and collection exercise documents shared by every launch
+    app.reference_cache = cache.ReferenceDataCache(app,
+                                                   maxsize=app['REFERENCE_CACHE_MAXSIZE'],
+                                                   ttl=app['REFERENCE_CACHE_TTL'],
+                                                   redis_ttl=app['REFERENCE_CACHE_REDIS_TTL'])
+
+    # Fills the reference cache in the background at startup, holding back readiness until it is done
+    app.cache_warmer = warmup.CacheWarmer(app,
+                                          collection_exercises=[collex_id.strip() for collex_id in
+                                                                app['WARMUP_COLLECTION_EXERCISES'].split(',')
+                                                                if collex_id.strip()],
+                                          timeout=app['WARMUP_TIMEOUT'])
+
+    # Pages that only differ by their CSP nonce, rendered once and reused
+    app.page_cache = page_cache.PageCache(enabled=app['PAGE_CACHE'])
+
+    # Access codes the IAC service has recently rejected, so repeats don't reach the IAC service
+    app.unknown_iacs = cache.UnknownIACCache(app, secret=app['SECRET_KEY'], ttl=app['IAC_NEGATIVE_CACHE_TTL'])
+
+    # Case events are posted in the background so that launches are not held up by the case service
+    app.case_events = case_events.CaseEventDispatcher(app,
+                                                      maxsize=app['CASE_EVENT_QUEUE_MAXSIZE'],
+                                                      batch_size=app['CASE_EVENT_BATCH_SIZE'],
+                                                      max_retries=app['CASE_EVENT_MAX_RETRIES'],
+                                                      retry_backoff=app['CASE_EVENT_RETRY_BACKOFF'],
+                                                      flush_timeout=app['CASE_EVENT_FLUSH_TIMEOUT'],
+                                                      stream=app['CASE_EVENT_STREAM'],
+                                                      recovery_age=app['CASE_EVENT_RECOVERY_AGE'],
+                                                      max_len=app['CASE_EVENT_STREAM_MAXLEN'],
+                                                      poll_interval=app['CASE_EVENT_POLL_INTERVAL'])
+
+    # Sheds launches while this worker is overloaded
+    app.admission = admission.AdmissionController(max_in_flight=app['ADMISSION_MAX_IN_FLIGHT'],
+                                                  max_loop_lag=app['ADMISSION_MAX_LOOP_LAG'],
+                                                  retry_after=app['ADMISSION_RETRY_AFTER'])
+
+    # Optional queue that lets launches through at the rate the RM services can sustain
+    app.waiting_room = waiting_room.WaitingRoom(app, rate=app['WAITING_ROOM_RATE'], refresh=app['WAITING_ROOM_REFRESH'])
+
+    # Limit on access code submissions per client, shared by every worker through redis
+    app.rate_limiter = rate_limit.RateLimiter(app, limit=app['IAC_RATE_LIMIT'], window=app['IAC_RATE_LIMIT_WINDOW'])
+
+    # Worker-local snapshot of the planned maintenance message, kept up to date from redis in the background
+    app.maintenance = maintenance.MaintenanceMonitor(app, poll_interval=app['MAINTENANCE_POLL_INTERVAL'])
+
     # Monkey patch the check_services function as a method to the app object
     app.check_services = types.MethodType(check_services, app)
 
@@ -108,21 +196,42 @@ def create_app(config_name=None) -> Application:
     # Setup jinja2 environment
     env = aiohttp_jinja2.setup(
         app,
-        loader=jinja2.PackageLoader("app", "templates"),
         context_processors=[
             flash.context_processor,
             aiohttp_jinja2.request_processor,
             google_analytics.ga_ua_id_processor],
-        extensions=['jinja2.ext.i18n'],
+        **template_cache.environment_options(app['TEMPLATE_BYTECODE_CACHE_DIR'], preload=app['TEMPLATE_PRELOAD'])
     )
     # Required to add the default gettext and ngettext functions for rendering
     env.install_null_translations()
+    if app['TEMPLATE_PRELOAD']:
+        # NB: compiled before any worker forks when gunicorn is run with --preload
+        template_cache.preload(env)
+
+    # After the jinja2 context processors, so the rate limited page can show its flash message
+    app.middlewares.append(rate_limit.rate_limit_middleware)
 
-    # JWT KeyStore
-    app["key_store"] = jwt.key_store(app["JSON_SECRET_KEYS"])
+    # JWT KeyStore, and the executor used to mint tokens with it
+    app["token_encrypter"] = jwt.TokenEncrypter(app["JSON_SECRET_KEYS"],
+                                                executor=app["TOKEN_EXECUTOR"],
+                                                max_workers=app["TOKEN_EXECUTOR_WORKERS"])
+    app["key_store"] = app["token_encrypter"].key_store
 
     app.on_startup.append(on_startup)
+    app.on_startup.append(app.upstream.start)
+    app.on_startup.append(app.cache_warmer.start)
+    app.on_startup.append(app.maintenance.start)
+    app.on_startup.append(app.case_events.start)
+    app.on_startup.append(app.admission.start)
+    app.on_cleanup.append(app.admission.stop)
+    app.on_cleanup.append(app.cache_warmer.stop)
+    app.on_cleanup.append(app.case_events.stop)
+    app.on_cleanup.append(app.maintenance.stop)
+    app.on_cleanup.append(app["token_encrypter"].stop)
+    app.on_cleanup.append(app.upstream.stop)
     app.on_cleanup.append(on_cleanup)
+    app.on_response_prepare.append(handlers.add_server_timing)
+    app.on_response_prepare.append(handlers.add_cache_control)
     if not app.debug:
         app.on_response_prepare.append(security.on_prepare)
 
@@ -0,0 +1,162 @@
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from structlog import wrap_logger
+
+from .exceptions import REDIS_ERRORS
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache for reference data that is the same for every respondent in a collection exercise.
+
+    Entries expire `ttl` seconds after being set and the least recently used entry is evicted once `maxsize` entries
+    are held. A `maxsize` of 0 disables caching.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._timer = timer
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        try:
+            expires_at, value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        if expires_at <= self._timer():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (self._timer() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+class ReferenceDataCache:
+    """
+    Two-tier cache for reference data: a worker-local TTLCache (L1) in front of serialized documents in redis (L2).
+
+    Redis is shared by every worker and instance, so a new worker or node starts warm and the RM services only see
+    one request per document each time the redis entry expires. A `redis_ttl` of 0 disables the redis tier.
+    """
+
+    key_prefix = 'respondent-home-ui:reference'
+
+    def __init__(self, app, maxsize: int, ttl: float, redis_ttl: int):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis_ttl = redis_ttl
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self._app = app
+
+    def redis_key(self, key: tuple) -> str:
+        return ':'.join((self.key_prefix,) + key)
+
+    async def get(self, key: tuple):
+        document = self.local.get(key)
+        if document is not None or not self.redis_ttl:
+            return document
+
+        try:
+            serialized = await self._app.redis_connection.get(self.redis_key(key))
+            document = json.loads(serialized) if serialized is not None else None
+        except REDIS_ERRORS as e:
+            logger.error('Failed to read reference data from redis', key=self.redis_key(key), message=str(e))
+            return None
+        except ValueError as e:
+            logger.error('Unexpected reference data received from redis', key=self.redis_key(key), message=str(e))
+            return None
+
+        if document is None:
+            self.redis_misses += 1
+        else:
+            self.redis_hits += 1
+            self.local.set(key, document)
+        return document
+
+    async def set(self, key: tuple, document):
+        self.local.set(key, document)
+        if not self.redis_ttl:
+            return
+
+        try:
+            await self._app.redis_connection.set(self.redis_key(key), json.dumps(document), expire=self.redis_ttl)
+        except REDIS_ERRORS as e:
+            logger.error('Failed to write reference data to redis', key=self.redis_key(key), message=str(e))
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.local.stats, redis_hits=self.redis_hits, redis_misses=self.redis_misses)
+
+
+class UnknownIACCache:
+    """
+    Negative cache of access codes that the IAC service does not recognise, shared by every worker through redis.
+
+    Codes are stored as an HMAC keyed with the app secret rather than in plain text. Lookups fail open, so if redis is
+    unavailable the IAC service is asked as usual. A `ttl` of 0 disables the cache.
+    """
+
+    key_prefix = 'respondent-home-ui:unknown-iac'
+
+    def __init__(self, app, secret: bytes, ttl: int):
+        self.ttl = ttl
+        self._app = app
+        self._secret = secret if isinstance(secret, bytes) else secret.encode()
+
+    def redis_key(self, iac: str) -> str:
+        return ':'.join((self.key_prefix, hmac.new(self._secret, iac.encode(), hashlib.sha256).hexdigest()))
+
+    async def contains(self, iac: str) -> bool:
+        if not self.ttl:
+            return False
+        try:
+            return bool(await self._app.redis_connection.exists(self.redis_key(iac)))
+        except REDIS_ERRORS as e:
+            logger.error('Failed to read unknown access code from redis', message=str(e))
+            return False
+
+    async def add(self, iac: str):
+        if not self.ttl:
+            return
+        try:
+            await self._app.redis_connection.set(self.redis_key(iac), '1', expire=self.ttl)
+        except REDIS_ERRORS as e:
+            logger.error('Failed to write unknown access code to redis', message=str(e))
@@ -1,4 +1,5 @@
 import logging
+import time
 
 from aiohttp import ClientError
 from aiohttp.web import Application
@@ -8,28 +9,36 @@ from structlog import wrap_logger
 logger = wrap_logger(logging.getLogger(__name__))
 
 
-async def get_case(case_id: str, app: Application):
+async def get_case(case_id: str, app: Application, deadline=None):
     url = f"{app['CASE_URL']}/cases/{case_id}"
     logger.debug(f"Making GET request to {url}")
-    async with app.http_session_pool.get(url, auth=app["CASE_AUTH"]) as response:
-        try:
-            response.raise_for_status()
-        except ClientError as ex:
-            logger.error("Error retrieving case", case_id=case_id, url=str(response.url), status_code=response.status)
-            raise ex
-        else:
-            logger.debug("Successfully retrieved case", case_id=case_id, url=str(response.url))
-        return await response.json()
+    response = await app.upstream.get(url, auth=app["CASE_AUTH"], deadline=deadline)
+    try:
+        response.raise_for_status()
+    except ClientError as ex:
+        logger.error("Error retrieving case", case_id=case_id, url=str(response.url), status_code=response.status)
+        raise ex
+    else:
+        logger.debug("Successfully retrieved case", case_id=case_id, url=str(response.url))
+    return await response.json()
 
 
-async def post_case_event(case_id: str, category: str, description: str, app: Application):
+async def post_case_event(case_id: str, category: str, description: str, app: Application, deadline=None):
     url = f"{app['CASE_URL']}/cases/{case_id}/events"
     logger.debug(f"Making POST request to {url}")
-    async with app.http_session_pool.post(
-        url,
-        auth=app["CASE_AUTH"],
-        json={'description': description, 'category': category, 'createdBy': 'RESPONDENT_HOME'}
-    ) as response:
+    start = time.perf_counter()
+    try:
+        request = app.upstream.session_for(url).post(
+            url,
+            auth=app["CASE_AUTH"],
+            json={'description': description, 'category': category, 'createdBy': 'RESPONDENT_HOME'}
+        )
+        response = await (deadline.wait(request) if deadline is not None else request)
+    except Exception:
+        app.metrics.observe_upstream('case', 'POST', 'error', time.perf_counter() - start)
+        raise
+    app.metrics.observe_upstream('case', 'POST', response.status, time.perf_counter() - start)
+    async with response:
         try:
             response.raise_for_status()
         except ClientError as ex:
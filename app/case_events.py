@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+
+import aioredis
+from aiohttp import ClientError
+from structlog import wrap_logger
+
+from .case import post_case_event
+from .exceptions import DeadlineExceededError, REDIS_ERRORS
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+# NB: includes the launch deadline running out on an inline post, which must not fail a launch whose token is built
+POST_ERRORS = (ClientError, asyncio.TimeoutError, DeadlineExceededError)
+
+
+class CaseEventDispatcher:
+    """
+    Write-behind dispatcher for case events, so that a respondent is not kept waiting on the case service.
+
+    Events are held in a bounded in-memory queue and posted in batches by a background worker, retrying failures with
+    exponential backoff. If the queue is full the event is posted inline instead. Outstanding events are flushed on
+    shutdown.
+
+    When `stream` is set events are appended to a redis stream, trimmed to about `max_len` entries, and every worker
+    reads them through the `group` consumer group instead. Posted events are acknowledged and removed from the
+    stream, and events that still fail after the last retry are moved to `<stream>:dead-letter`. Events read by a
+    worker that died are claimed by another once they have been pending for `recovery_age` seconds, so an event may
+    occasionally be posted more than once. Events that can't be written to the stream are queued in memory as before.
+    """
+
+    def __init__(self, app, maxsize: int, batch_size: int, max_retries: int, retry_backoff: float,
+                 flush_timeout: float, stream: str = '', recovery_age: float = 60, max_len: int = 10000,
+                 poll_interval: float = 1.0, group: str = 'respondent-home-ui'):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.flush_timeout = flush_timeout
+        self.stream = stream
+        self.recovery_age = recovery_age
+        self.max_len = max_len
+        self.poll_interval = poll_interval
+        self.group = group
+        self.consumer = f'{socket.gethostname()}-{os.getpid()}'
+        self._app = app
+        self._queue = None
+        self._worker = None
+        self._consumer = None
+        self._wakeup = None
+        self._in_flight = set()
+        self._group_created = False
+        self._reclaimed_at = None
+
+    @property
+    def dead_letter_stream(self) -> str:
+        return f'{self.stream}:dead-letter'
+
+    async def enqueue(self, case_id: str, category: str, description: str, deadline=None):
+        """Queues an event to be posted. An event posted inline is given whatever remains of `deadline`."""
+        event = {'case_id': case_id, 'category': category, 'description': description}
+        if self._worker is None:
+            logger.warn('Case event dispatcher not running, posting inline', case_id=case_id)
+            await self._dispatch([(None, event)], max_retries=0, deadline=deadline)
+            return
+        if await self._persist(event):
+            self._wakeup.set()
+            return
+        try:
+            self._queue.put_nowait((None, event))
+        except asyncio.QueueFull:
+            logger.warn('Case event queue full, posting inline', case_id=case_id)
+            await self._dispatch([(None, event)], max_retries=0, deadline=deadline)
+
+    async def flush(self, timeout=None):
+        """Posts the events waiting in the queue, and in the stream if there is one"""
+        try:
+            if self.stream:
+                await asyncio.wait_for(self._drain(), timeout=timeout)
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error('Timed out flushing case events', outstanding=self._queue.qsize())
+
+    async def _persist(self, event):
+        if not self.stream:
+            return None
+        try:
+            return await self._app.redis_connection.xadd(self.stream, event, max_len=self.max_len)
+        except REDIS_ERRORS as e:
+            logger.warn('Failed to persist case event to redis', case_id=event['case_id'], message=str(e))
+            return None
+
+    async def _ensure_group(self) -> bool:
+        if not self._group_created:
+            self._group_created = await self._create_group()
+        return self._group_created
+
+    async def _create_group(self) -> bool:
+        try:
+            await self._app.redis_connection.xgroup_create(self.stream, self.group, latest_id='0', mkstream=True)
+        except aioredis.ReplyError as e:
+            if not str(e).startswith('BUSYGROUP'):
+                logger.warn('Failed to create case event consumer group', message=str(e))
+                return False
+        except REDIS_ERRORS as e:
+            logger.warn('Failed to create case event consumer group', message=str(e))
+            return False
+        return True
+
+    @staticmethod
+    def _event(fields) -> dict:
+        return {key.decode(): value.decode() for key, value in fields.items()}
+
+    async def _put(self, entry_id, fields):
+        self._in_flight.add(entry_id)
+        await self._queue.put((entry_id, self._event(fields)))
+
+    async def _pull(self) -> int:
+        """Moves new events from the stream to the queue, returning how many there were"""
+        try:
+            entries = await self._app.redis_connection.xread_group(self.group, self.consumer, [self.stream],
+                                                                   timeout=None, count=self.batch_size,
+                                                                   latest_ids=['>'])
+        except REDIS_ERRORS as e:
+            logger.warn('Failed to read case events from redis', message=str(e))
+            return 0
+        for _, entry_id, fields in entries:
+            await self._put(entry_id, fields)
+        return len(entries)
+
+    async def _drain(self):
+        if not await self._ensure_group():
+            return
+        while await self._pull():
+            pass
+
+    async def _reclaim(self):
+        """Claims the events left pending for longer than `recovery_age`, other than those this worker is posting"""
+        min_idle_time = int(self.recovery_age * 1000)
+        try:
+            pending = await self._app.redis_connection.xpending(self.stream, self.group, '-', '+', self.maxsize)
+            entry_ids = [entry_id for entry_id, _, idle_time, _ in pending
+                         if entry_id not in self._in_flight and idle_time >= min_idle_time]
+            if not entry_ids:
+                return
+            # NB: XCLAIM checks the idle time again, so only one worker gets each event. It is sent as is because
+            # aioredis leaves out the entries MAXLEN trimmed while they were pending, which come back without fields
+            claimed = await self._app.redis_connection.execute(b'XCLAIM', self.stream, self.group, self.consumer,
+                                                               min_idle_time, *entry_ids)
+        except REDIS_ERRORS as e:
+            logger.warn('Failed to recover case events from redis', message=str(e))
+            return
+
+        entries = [entry for entry in claimed if entry is not None and entry[1] is not None]
+        trimmed = [entry[0] for entry in claimed if entry is not None and entry[1] is None]
+        if trimmed:
+            logger.error('Case events trimmed from redis before they were posted', count=len(trimmed))
+            await self._acknowledge(trimmed)
+        for entry_id, values in entries:
+            await self._put(entry_id, OrderedDict(zip(values[::2], values[1::2])))
+        if entries:
+            logger.info('Recovered case events from redis', count=len(entries))
+
+    async def _poll(self) -> int:
+        """Reclaims events when due and moves new events to the queue, returning how many new events there were"""
+        if not await self._ensure_group():
+            return 0
+        if self._reclaimed_at is None or time.monotonic() - self._reclaimed_at >= self.recovery_age:
+            self._reclaimed_at = time.monotonic()
+            await self._reclaim()
+        self._wakeup.clear()
+        return await self._pull()
+
+    async def _consume(self):
+        while True:
+            try:
+                if await self._poll():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # NB: logged and retried, as events in the stream would wait for a restart if the task died
+                logger.exception('Unexpected error reading case events')
+            # NB: reads don't block in redis, as they would hold up other commands sharing the connection
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _acknowledge(self, entry_ids):
+        entry_ids = [entry_id for entry_id in entry_ids if entry_id is not None]
+        if not entry_ids:
+            return
+        try:
+            await self._app.redis_connection.xack(self.stream, self.group, *entry_ids)
+            for entry_id in entry_ids:
+                await self._app.redis_connection.xdel(self.stream, entry_id)
+        except REDIS_ERRORS as e:
+            logger.warn('Failed to remove case events from redis', entry_ids=entry_ids, message=str(e))
+
+    async def _dead_letter(self, entry_id, event):
+        try:
+            await self._app.redis_connection.xadd(self.dead_letter_stream, event, max_len=self.max_len)
+        except REDIS_ERRORS as e:
+            # NB: left pending, to be tried again once it is reclaimed
+            logger.warn('Failed to dead-letter case event', entry_id=entry_id, message=str(e))
+            return
+        await self._acknowledge([entry_id])
+
+    async def _dispatch(self, batch, max_retries, deadline=None):
+        for attempt in range(max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            results = await asyncio.gather(
+                *[post_case_event(event['case_id'], event['category'], event['description'], self._app, deadline)
+                  for _, event in batch],
+                return_exceptions=True)
+            await self._acknowledge([entry_id for (entry_id, _), result in zip(batch, results)
+                                     if not isinstance(result, BaseException)])
+            failed = [(item, result) for item, result in zip(batch, results) if isinstance(result, BaseException)]
+            for _, result in failed:
+                if not isinstance(result, POST_ERRORS):
+                    raise result
+            batch = [item for item, _ in failed]
+            if not batch:
+                return
+
+        for entry_id, event in batch:
+            logger.error('Failed to post case event', case_id=event['case_id'], category=event['category'],
+                         attempts=max_retries + 1)
+            if entry_id is not None:
+                await self._dead_letter(entry_id, event)
+
+    async def _work(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._dispatch(batch, max_retries=self.max_retries)
+            except Exception:
+                logger.exception('Unexpected error posting case events')
+            finally:
+                for entry_id, _ in batch:
+                    self._in_flight.discard(entry_id)
+                    self._queue.task_done()
+
+    async def start(self, app):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker = asyncio.ensure_future(self._work())
+        if self.stream:
+            self._wakeup = asyncio.Event()
+            self._consumer = asyncio.ensure_future(self._consume())
+
+    @staticmethod
+    async def _cancel(task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def stop(self, app):
+        if self._worker is None:
+            return
+        # NB: the stream is drained by the flush. Events still not posted when it times out stay pending in the stream
+        # until another worker reclaims them
+        if self._consumer is not None:
+            await self._cancel(self._consumer)
+            self._consumer = None
+        await self.flush(timeout=self.flush_timeout)
+        await self._cancel(self._worker)
+        self._worker = None
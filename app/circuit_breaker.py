@@ -0,0 +1,78 @@
+import logging
+import time
+
+from structlog import wrap_logger
+
+from .exceptions import CircuitOpenError
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of an upstream service so that requests to it can fail fast while it is down.
+
+    The breaker opens after `failure_threshold` consecutive failures and rejects requests for `reset_timeout` seconds.
+    It then goes half-open and lets a single trial request through. The breaker closes again if the trial succeeds and
+    re-opens if it fails.
+    """
+
+    def __init__(self, service: str, url: str, failure_threshold: int, reset_timeout: float, timer=time.monotonic):
+        self.service = service
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.rejected = 0
+        self._timer = timer
+        self._state = CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._timer() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def before_request(self):
+        """Raises CircuitOpenError if a request to the service should not be made now"""
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and not self._trial_in_flight:
+            self._state = HALF_OPEN
+            self._trial_in_flight = True
+            logger.info('Circuit half-open, allowing trial request', service_name=self.service)
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.service)
+
+    def record_success(self):
+        if self._state != CLOSED:
+            logger.info('Circuit closed', service_name=self.service)
+        self._state = CLOSED
+        self._trial_in_flight = False
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != OPEN:
+                logger.error('Circuit opened', service_name=self.service, failures=self.failures)
+            self._state = OPEN
+            self._opened_at = self._timer()
+            self._trial_in_flight = False
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
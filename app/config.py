@@ -42,6 +42,8 @@ class BaseConfig:
     ACCOUNT_SERVICE_URL = env("ACCOUNT_SERVICE_URL")
     EQ_URL = env("EQ_URL")
     JSON_SECRET_KEYS = env("JSON_SECRET_KEYS")
+    TOKEN_EXECUTOR = env("TOKEN_EXECUTOR", default="thread")
+    TOKEN_EXECUTOR_WORKERS = env("TOKEN_EXECUTOR_WORKERS", cast=int, default=2)
 
     CASE_URL = env("CASE_URL")
     CASE_AUTH = (env("CASE_USERNAME"), env("CASE_PASSWORD"))
@@ -54,6 +56,17 @@ class BaseConfig:
 
     IAC_URL = env("IAC_URL")
     IAC_AUTH = (env("IAC_USERNAME"), env("IAC_PASSWORD"))
+    IAC_NEGATIVE_CACHE_TTL = env("IAC_NEGATIVE_CACHE_TTL", cast=int, default=60)
+    IAC_RATE_LIMIT = env("IAC_RATE_LIMIT", cast=int, default=0)
+    IAC_RATE_LIMIT_WINDOW = env("IAC_RATE_LIMIT_WINDOW", cast=float, default=60.0)
+    TRUSTED_PROXY_HOPS = env("TRUSTED_PROXY_HOPS", cast=int)
+
+    ADMISSION_MAX_IN_FLIGHT = env("ADMISSION_MAX_IN_FLIGHT", cast=int, default=200)
+    ADMISSION_MAX_LOOP_LAG = env("ADMISSION_MAX_LOOP_LAG", cast=float, default=0.5)
+    ADMISSION_RETRY_AFTER = env("ADMISSION_RETRY_AFTER", cast=int, default=5)
+
+    WAITING_ROOM_RATE = env("WAITING_ROOM_RATE", cast=float, default=0.0)
+    WAITING_ROOM_REFRESH = env("WAITING_ROOM_REFRESH", cast=int, default=5)
 
     SAMPLE_URL = env("SAMPLE_URL")
     SAMPLE_AUTH = (env("SAMPLE_USERNAME"), env("SAMPLE_PASSWORD"))
@@ -64,7 +77,42 @@ class BaseConfig:
     REDIS_SERVICE = env("REDIS_SERVICE")  # required to populate host and port with cf values
     REDIS_HOST = env("REDIS_HOST", default="")  # populated by cf after setup
     REDIS_PORT = env("REDIS_PORT", default=0)  # populated by cf after setup
+    REDIS_POOL_MAXSIZE = env("REDIS_POOL_MAXSIZE", cast=int, default=10)
+    REDIS_TIMEOUT = env("REDIS_TIMEOUT", cast=float, default=1.0)
     REDIS_MAINTENANCE_KEY = env("REDIS_MAINTENANCE_KEY", default="respondent-home-ui:maintenance")
+    REDIS_MAINTENANCE_CHANNEL = env("REDIS_MAINTENANCE_CHANNEL", default="respondent-home-ui:maintenance:changed")
+    MAINTENANCE_POLL_INTERVAL = env("MAINTENANCE_POLL_INTERVAL", cast=float, default=30.0)
+
+    REFERENCE_CACHE_MAXSIZE = env("REFERENCE_CACHE_MAXSIZE", cast=int, default=1000)
+    REFERENCE_CACHE_TTL = env("REFERENCE_CACHE_TTL", cast=int, default=300)
+    REFERENCE_CACHE_REDIS_TTL = env("REFERENCE_CACHE_REDIS_TTL", cast=int, default=900)
+    WARMUP_COLLECTION_EXERCISES = env("WARMUP_COLLECTION_EXERCISES", default="")
+    WARMUP_TIMEOUT = env("WARMUP_TIMEOUT", cast=float, default=10.0)
+
+    CASE_EVENT_QUEUE_MAXSIZE = env("CASE_EVENT_QUEUE_MAXSIZE", cast=int, default=1000)
+    CASE_EVENT_BATCH_SIZE = env("CASE_EVENT_BATCH_SIZE", cast=int, default=20)
+    CASE_EVENT_MAX_RETRIES = env("CASE_EVENT_MAX_RETRIES", cast=int, default=5)
+    CASE_EVENT_RETRY_BACKOFF = env("CASE_EVENT_RETRY_BACKOFF", cast=float, default=0.5)
+    CASE_EVENT_FLUSH_TIMEOUT = env("CASE_EVENT_FLUSH_TIMEOUT", cast=float, default=10.0)
+    CASE_EVENT_STREAM = env("CASE_EVENT_STREAM", default="")
+    CASE_EVENT_RECOVERY_AGE = env("CASE_EVENT_RECOVERY_AGE", cast=float, default=60.0)
+    CASE_EVENT_STREAM_MAXLEN = env("CASE_EVENT_STREAM_MAXLEN", cast=int, default=10000)
+    CASE_EVENT_POLL_INTERVAL = env("CASE_EVENT_POLL_INTERVAL", cast=float, default=1.0)
+
+    UPSTREAM_CONNECTION_LIMIT = env("UPSTREAM_CONNECTION_LIMIT", cast=int, default=100)
+    UPSTREAM_LIMIT_PER_HOST = env("UPSTREAM_LIMIT_PER_HOST", cast=int, default=50)
+    UPSTREAM_KEEPALIVE_TIMEOUT = env("UPSTREAM_KEEPALIVE_TIMEOUT", cast=float, default=30.0)
+    UPSTREAM_DNS_CACHE_TTL = env("UPSTREAM_DNS_CACHE_TTL", cast=int, default=60)
+    UPSTREAM_RESOLVE = env("UPSTREAM_RESOLVE", default="")
+    UPSTREAM_HEDGE_SERVICES = env("UPSTREAM_HEDGE_SERVICES", default="")
+    UPSTREAM_HEDGE_PERCENTILE = env("UPSTREAM_HEDGE_PERCENTILE", cast=float, default=95.0)
+    UPSTREAM_HEDGE_MAX_RATE = env("UPSTREAM_HEDGE_MAX_RATE", cast=float, default=0.05)
+
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = env("CIRCUIT_BREAKER_FAILURE_THRESHOLD", cast=int, default=5)
+    CIRCUIT_BREAKER_RESET_TIMEOUT = env("CIRCUIT_BREAKER_RESET_TIMEOUT", cast=float, default=30.0)
+
+    HEALTH_CHECK_TIMEOUT = env("HEALTH_CHECK_TIMEOUT", cast=float, default=2.0)
+    HEALTH_CHECK_CACHE_TTL = env("HEALTH_CHECK_CACHE_TTL", cast=float, default=5.0)
 
     SECRET_KEY = env("SECRET_KEY")
 
@@ -72,6 +120,16 @@ class BaseConfig:
 
     ANALYTICS_UA_ID = env("ANALYTICS_UA_ID", default="")
 
+    SERVER_TIMING = env("SERVER_TIMING", cast=bool, default=False)
+
+    TEMPLATE_PRELOAD = env("TEMPLATE_PRELOAD", cast=bool, default=True)
+    TEMPLATE_BYTECODE_CACHE_DIR = env("TEMPLATE_BYTECODE_CACHE_DIR", default="")
+    PAGE_CACHE = env("PAGE_CACHE", cast=bool, default=True)
+    INDEX_CACHE_CONTROL = env("INDEX_CACHE_CONTROL", default="private, no-cache")
+    STATIC_PAGE_CACHE_CONTROL = env("STATIC_PAGE_CACHE_CONTROL", default="private, max-age=3600")
+
+    LAUNCH_DEADLINE = env("LAUNCH_DEADLINE", cast=float, default=15.0)
+
 
 class ProductionConfig(BaseConfig):
     pass
@@ -86,6 +144,8 @@ class DevelopmentConfig:
     ACCOUNT_SERVICE_URL = env.str("ACCOUNT_SERVICE_URL", default="http://localhost:9092")
     EQ_URL = env.str("EQ_URL", default="http://localhost:5000")
     JSON_SECRET_KEYS = env.str("JSON_SECRET_KEYS", default=None) or open("./tests/test_data/test_keys.json").read()
+    TOKEN_EXECUTOR = env.str("TOKEN_EXECUTOR", default="thread")
+    TOKEN_EXECUTOR_WORKERS = env.int("TOKEN_EXECUTOR_WORKERS", default=2)
 
     COLLECTION_EXERCISE_URL = env.str("COLLECTION_EXERCISE_URL", default="http://localhost:8145")
     COLLECTION_EXERCISE_AUTH = (
@@ -104,6 +164,17 @@ class DevelopmentConfig:
 
     IAC_URL = env.str("IAC_URL", default="http://localhost:8121")
     IAC_AUTH = (env.str("IAC_USERNAME", default="admin"), env.str("IAC_PASSWORD", default="secret"))
+    IAC_NEGATIVE_CACHE_TTL = env.int("IAC_NEGATIVE_CACHE_TTL", default=60)
+    IAC_RATE_LIMIT = env.int("IAC_RATE_LIMIT", default=0)
+    IAC_RATE_LIMIT_WINDOW = env.float("IAC_RATE_LIMIT_WINDOW", default=60.0)
+    TRUSTED_PROXY_HOPS = env.int("TRUSTED_PROXY_HOPS", default=1)
+
+    ADMISSION_MAX_IN_FLIGHT = env.int("ADMISSION_MAX_IN_FLIGHT", default=200)
+    ADMISSION_MAX_LOOP_LAG = env.float("ADMISSION_MAX_LOOP_LAG", default=0.5)
+    ADMISSION_RETRY_AFTER = env.int("ADMISSION_RETRY_AFTER", default=5)
+
+    WAITING_ROOM_RATE = env.float("WAITING_ROOM_RATE", default=0.0)
+    WAITING_ROOM_REFRESH = env.int("WAITING_ROOM_REFRESH", default=5)
 
     SAMPLE_URL = env("SAMPLE_URL", default="http://localhost:8125")
     SAMPLE_AUTH = (env("SAMPLE_USERNAME", default="admin"), env("SAMPLE_PASSWORD", default="secret"))
@@ -113,7 +184,42 @@ class DevelopmentConfig:
 
     REDIS_HOST = env.str("REDIS_HOST", default="localhost")
     REDIS_PORT = env.int("REDIS_PORT", default=6379)
+    REDIS_POOL_MAXSIZE = env.int("REDIS_POOL_MAXSIZE", default=10)
+    REDIS_TIMEOUT = env.float("REDIS_TIMEOUT", default=1.0)
     REDIS_MAINTENANCE_KEY = env.str("REDIS_MAINTENANCE_KEY", default="respondent-home-ui:maintenance")
+    REDIS_MAINTENANCE_CHANNEL = env.str("REDIS_MAINTENANCE_CHANNEL", default="respondent-home-ui:maintenance:changed")
+    MAINTENANCE_POLL_INTERVAL = env.float("MAINTENANCE_POLL_INTERVAL", default=30.0)
+
+    REFERENCE_CACHE_MAXSIZE = env.int("REFERENCE_CACHE_MAXSIZE", default=1000)
+    REFERENCE_CACHE_TTL = env.int("REFERENCE_CACHE_TTL", default=300)
+    REFERENCE_CACHE_REDIS_TTL = env.int("REFERENCE_CACHE_REDIS_TTL", default=900)
+    WARMUP_COLLECTION_EXERCISES = env.str("WARMUP_COLLECTION_EXERCISES", default="")
+    WARMUP_TIMEOUT = env.float("WARMUP_TIMEOUT", default=10.0)
+
+    CASE_EVENT_QUEUE_MAXSIZE = env.int("CASE_EVENT_QUEUE_MAXSIZE", default=1000)
+    CASE_EVENT_BATCH_SIZE = env.int("CASE_EVENT_BATCH_SIZE", default=20)
+    CASE_EVENT_MAX_RETRIES = env.int("CASE_EVENT_MAX_RETRIES", default=5)
+    CASE_EVENT_RETRY_BACKOFF = env.float("CASE_EVENT_RETRY_BACKOFF", default=0.5)
+    CASE_EVENT_FLUSH_TIMEOUT = env.float("CASE_EVENT_FLUSH_TIMEOUT", default=10.0)
+    CASE_EVENT_STREAM = env.str("CASE_EVENT_STREAM", default="respondent-home-ui:case-events")
+    CASE_EVENT_RECOVERY_AGE = env.float("CASE_EVENT_RECOVERY_AGE", default=60.0)
+    CASE_EVENT_STREAM_MAXLEN = env.int("CASE_EVENT_STREAM_MAXLEN", default=10000)
+    CASE_EVENT_POLL_INTERVAL = env.float("CASE_EVENT_POLL_INTERVAL", default=1.0)
+
+    UPSTREAM_CONNECTION_LIMIT = env.int("UPSTREAM_CONNECTION_LIMIT", default=100)
+    UPSTREAM_LIMIT_PER_HOST = env.int("UPSTREAM_LIMIT_PER_HOST", default=50)
+    UPSTREAM_KEEPALIVE_TIMEOUT = env.float("UPSTREAM_KEEPALIVE_TIMEOUT", default=30.0)
+    UPSTREAM_DNS_CACHE_TTL = env.int("UPSTREAM_DNS_CACHE_TTL", default=60)
+    UPSTREAM_RESOLVE = env.str("UPSTREAM_RESOLVE", default="")
+    UPSTREAM_HEDGE_SERVICES = env.str("UPSTREAM_HEDGE_SERVICES", default="case,sample")
+    UPSTREAM_HEDGE_PERCENTILE = env.float("UPSTREAM_HEDGE_PERCENTILE", default=95.0)
+    UPSTREAM_HEDGE_MAX_RATE = env.float("UPSTREAM_HEDGE_MAX_RATE", default=0.05)
+
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = env.int("CIRCUIT_BREAKER_FAILURE_THRESHOLD", default=5)
+    CIRCUIT_BREAKER_RESET_TIMEOUT = env.float("CIRCUIT_BREAKER_RESET_TIMEOUT", default=30.0)
+
+    HEALTH_CHECK_TIMEOUT = env.float("HEALTH_CHECK_TIMEOUT", default=2.0)
+    HEALTH_CHECK_CACHE_TTL = env.float("HEALTH_CHECK_CACHE_TTL", default=5.0)
 
     SECRET_KEY = env.str("SECRET_KEY", default=None) or generate_new_key()
 
@@ -121,6 +227,16 @@ class DevelopmentConfig:
 
     ANALYTICS_UA_ID = env("ANALYTICS_UA_ID", default="")
 
+    SERVER_TIMING = env.bool("SERVER_TIMING", default=True)
+
+    TEMPLATE_PRELOAD = env.bool("TEMPLATE_PRELOAD", default=False)
+    TEMPLATE_BYTECODE_CACHE_DIR = env.str("TEMPLATE_BYTECODE_CACHE_DIR", default="")
+    PAGE_CACHE = env.bool("PAGE_CACHE", default=False)
+    INDEX_CACHE_CONTROL = env.str("INDEX_CACHE_CONTROL", default="private, no-cache")
+    STATIC_PAGE_CACHE_CONTROL = env.str("STATIC_PAGE_CACHE_CONTROL", default="private, no-cache")
+
+    LAUNCH_DEADLINE = env.float("LAUNCH_DEADLINE", default=15.0)
+
 
 class TestingConfig:
     HOST = "0.0.0.0"
@@ -130,6 +246,8 @@ class TestingConfig:
     ACCOUNT_SERVICE_URL = "http://localhost:9092"
     EQ_URL = "http://localhost:5000"
     JSON_SECRET_KEYS = open("./tests/test_data/test_keys.json").read()
+    TOKEN_EXECUTOR = "inline"
+    TOKEN_EXECUTOR_WORKERS = 1
 
     COLLECTION_EXERCISE_URL = "http://localhost:8145"
     COLLECTION_EXERCISE_AUTH = ("admin", "secret")
@@ -142,6 +260,17 @@ class TestingConfig:
 
     IAC_URL = "http://localhost:8121"
     IAC_AUTH = ("admin", "secret")
+    IAC_NEGATIVE_CACHE_TTL = 0
+    IAC_RATE_LIMIT = 0
+    IAC_RATE_LIMIT_WINDOW = 60.0
+    TRUSTED_PROXY_HOPS = 1
+
+    ADMISSION_MAX_IN_FLIGHT = 200
+    ADMISSION_MAX_LOOP_LAG = 0.5
+    ADMISSION_RETRY_AFTER = 5
+
+    WAITING_ROOM_RATE = 0.0
+    WAITING_ROOM_REFRESH = 5
 
     SAMPLE_URL = "http://localhost:8125"
     SAMPLE_AUTH = ("admin", "secret")
@@ -152,10 +281,55 @@ class TestingConfig:
     REDIS_HOST = "localhost"
     REDIS_PORT = 6379
     REDIS_SERVICE = "test-redis"
+    REDIS_POOL_MAXSIZE = 10
+    REDIS_TIMEOUT = 1.0
     REDIS_MAINTENANCE_KEY = "respondent-home-ui:maintenance"
+    REDIS_MAINTENANCE_CHANNEL = "respondent-home-ui:maintenance:changed"
+    MAINTENANCE_POLL_INTERVAL = 0
+
+    REFERENCE_CACHE_MAXSIZE = 1000
+    REFERENCE_CACHE_TTL = 300
+    REFERENCE_CACHE_REDIS_TTL = 0
+    WARMUP_COLLECTION_EXERCISES = ""
+    WARMUP_TIMEOUT = 10.0
+
+    CASE_EVENT_QUEUE_MAXSIZE = 1000
+    CASE_EVENT_BATCH_SIZE = 20
+    CASE_EVENT_MAX_RETRIES = 2
+    CASE_EVENT_RETRY_BACKOFF = 0
+    CASE_EVENT_FLUSH_TIMEOUT = 1.0
+    CASE_EVENT_STREAM = ""
+    CASE_EVENT_RECOVERY_AGE = 60.0
+    CASE_EVENT_STREAM_MAXLEN = 10000
+    CASE_EVENT_POLL_INTERVAL = 1.0
+
+    UPSTREAM_CONNECTION_LIMIT = 100
+    UPSTREAM_LIMIT_PER_HOST = 50
+    UPSTREAM_KEEPALIVE_TIMEOUT = 30.0
+    UPSTREAM_DNS_CACHE_TTL = 60
+    UPSTREAM_RESOLVE = ""
+    UPSTREAM_HEDGE_SERVICES = ""
+    UPSTREAM_HEDGE_PERCENTILE = 95.0
+    UPSTREAM_HEDGE_MAX_RATE = 0.05
+
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+    CIRCUIT_BREAKER_RESET_TIMEOUT = 30.0
+
+    HEALTH_CHECK_TIMEOUT = 2.0
+    HEALTH_CHECK_CACHE_TTL = 5.0
 
     SECRET_KEY = generate_new_key()
 
     URL_PATH_PREFIX = ""
 
     ANALYTICS_UA_ID = ""
+
+    SERVER_TIMING = True
+
+    TEMPLATE_PRELOAD = False
+    TEMPLATE_BYTECODE_CACHE_DIR = ""
+    PAGE_CACHE = True
+    INDEX_CACHE_CONTROL = "private, no-cache"
+    STATIC_PAGE_CACHE_CONTROL = "private, max-age=3600"
+
+    LAUNCH_DEADLINE = 15.0
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+from .exceptions import DeadlineExceededError
+
+
+class Deadline:
+    """
+    A time budget shared by every upstream call made for one request.
+
+    Each call waits only for whatever is left of the budget, rather than getting a full ClientTimeout of its own.
+    """
+
+    def __init__(self, seconds: float, timer=time.monotonic):
+        self.seconds = seconds
+        self._timer = timer
+        self._expires_at = timer() + seconds
+
+    @property
+    def remaining(self) -> float:
+        return max(self._expires_at - self._timer(), 0.0)
+
+    def check(self):
+        """Raises DeadlineExceededError if the budget has been used up"""
+        if self.remaining <= 0:
+            raise DeadlineExceededError(self.seconds)
+
+    async def wait(self, awaitable):
+        """Awaits `awaitable` for the time remaining, raising DeadlineExceededError if it takes longer"""
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(self.seconds)
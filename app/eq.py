@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import logging
 import time
@@ -18,6 +19,16 @@ logger = wrap_logger(logging.getLogger(__name__))
 
 Request = namedtuple("Request", ["method", "path", "auth", "func"])
 
+# Reference data shared by every case in a collection exercise, by reference cache key: (service url, path, auth)
+REFERENCE_DOCUMENTS = {
+    "collection_instrument": (
+        "COLLECTION_INSTRUMENT_URL", "/collection-instrument-api/1.0.2/collectioninstrument/id/{}",
+        "COLLECTION_INSTRUMENT_AUTH"),
+    "collection_exercise": ("COLLECTION_EXERCISE_URL", "/collectionexercises/{}", "COLLECTION_EXERCISE_AUTH"),
+    "collection_exercise_events": (
+        "COLLECTION_EXERCISE_URL", "/collectionexercises/{}/events", "COLLECTION_EXERCISE_AUTH"),
+}
+
 
 def handle_response(response):
     try:
@@ -29,6 +40,17 @@ def handle_response(response):
         logger.debug("Successfully connected to service", url=str(response.url))
 
 
+def reference_request(app: Application, kind: str, document_id: str) -> Request:
+    """
+    Builds the request for a reference document
+    :param kind: a key of REFERENCE_DOCUMENTS
+    :param document_id: the id of the collection instrument or collection exercise
+    :return: Request
+    """
+    service_url, path, auth = REFERENCE_DOCUMENTS[kind]
+    return Request("GET", app[service_url] + path.format(document_id), app[auth], handle_response)
+
+
 def parse_date(string_date):
     """
     Parses a date string from ISO 8601 format to be converted elsewhere.
@@ -72,15 +94,14 @@ def build_response_id(case_id, collex_id, iac):
 
 class EqPayloadConstructor(object):
 
-    def __init__(self, case: dict, app: Application, iac: str):
+    def __init__(self, case: dict, app: Application, iac: str, deadline=None):
         """
         Creates the payload needed to communicate with EQ, built from the Case, Collection Exercise, Sample,
-        and Collection Instrument services
+        and Collection Instrument services. Requests to them share whatever remains of `deadline`, if given.
         """
 
         self._app = app
-        self._ci_url = f"{app['COLLECTION_INSTRUMENT_URL']}/collection-instrument-api/1.0.2/collectioninstrument/id/"
-        self._collex_url = f"{app['COLLECTION_EXERCISE_URL']}/collectionexercises/"
+        self._deadline = deadline
         self._sample_url = f"{app['SAMPLE_URL']}/samples/"
 
         self._tx_id = str(uuid4())
@@ -125,7 +146,14 @@ class EqPayloadConstructor(object):
 
     async def build(self):
         """__init__ is not a coroutine function, so I/O needs to go here"""
-        self._ci = await self._get_collection_instrument()
+        ci, collex, collex_events, sample_attributes = await self._fetch_concurrently(
+            self._get_collection_instrument(),
+            self._get_collection_exercise(),
+            self._get_collection_exercise_events(),
+            self._get_sample_attributes_by_id(),
+        )
+
+        self._ci = self._fetched_result(ci)
 
         try:
             if self._ci["type"] != "EQ":
@@ -148,7 +176,7 @@ class EqPayloadConstructor(object):
         except KeyError:
             raise InvalidEqPayLoad(f"Could not retrieve form_type for eq_id {self._eq_id}")
 
-        self._collex = await self._get_collection_exercise()
+        self._collex = self._fetched_result(collex)
 
         try:
             self._collex_period_id = self._collex["exerciseRef"]
@@ -160,9 +188,9 @@ class EqPayloadConstructor(object):
         except KeyError:
             raise InvalidEqPayLoad(f"Could not retrieve ce id for case {self._case_id}")
 
-        self._collex_events = await self._get_collection_exercise_events()
+        self._collex_events = self._fetched_result(collex_events)
         self._collex_event_dates = self._get_collex_event_dates()
-        self._sample_attributes = await self._get_sample_attributes_by_id()
+        self._sample_attributes = self._fetched_result(sample_attributes)
 
         try:
             self._sample_attributes = self._sample_attributes["attributes"]
@@ -238,28 +266,77 @@ class EqPayloadConstructor(object):
             raise InvalidEqPayLoad("Displayable address not in sample attributes")
         return display_address
 
+    async def _fetch_concurrently(self, *coros):
+        """
+        Runs the upstream requests concurrently, cancelling any still in flight as soon as one of them fails
+
+        :param coros: request coroutines
+        :return: list of finished futures in the order the coroutines were supplied
+        """
+        futures = [asyncio.ensure_future(coro) for coro in coros]
+        try:
+            await asyncio.wait(futures, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            pending = [future for future in futures if not future.done()]
+            for future in pending:
+                future.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+        self._fetch_error = next(
+            (future.exception() for future in futures if not future.cancelled() and future.exception()), None)
+        if pending:
+            logger.info("Cancelled outstanding requests after failure", case_id=self._case_id, cancelled=len(pending))
+        return futures
+
+    def _fetched_result(self, future):
+        """
+        Results are consumed in the same order they were previously requested in, so validation errors for
+        earlier documents still take precedence over failures fetching later ones.
+
+        :param future: a future returned by _fetch_concurrently
+        :return: the JSON response
+        """
+        if future.cancelled():
+            raise self._fetch_error
+        return future.result()
+
     async def _make_request(self, request: Request):
         method, url, auth, func = request
         logger.info(f"Making {method} request to {url} and handling with {func.__name__}")
+        if method == "GET":
+            resp = await self._app.upstream.get(url, auth=auth, deadline=self._deadline)
+            func(resp)
+            return await resp.json()
         async with self._app.http_session_pool.request(method, url, auth=auth) as resp:
             func(resp)
             return await resp.json()
 
+    async def _make_cached_request(self, key: tuple, request: Request):
+        cache = self._app.reference_cache
+        document = await cache.get(key)
+        if document is None:
+            document = await self._make_request(request)
+            await cache.set(key, document)
+        else:
+            logger.debug("Using cached response", key=key, url=request.path)
+        return document
+
     async def _get_sample_attributes_by_id(self):
         url = self._sample_url + self._sample_unit_id + "/attributes"
         return await self._make_request(Request("GET", url, self._app['SAMPLE_AUTH'], handle_response))
 
     async def _get_collection_instrument(self):
-        url = self._ci_url + self._ci_id
-        return await self._make_request(Request("GET", url, self._app['COLLECTION_INSTRUMENT_AUTH'], handle_response))
+        key = ("collection_instrument", self._ci_id)
+        return await self._make_cached_request(key, reference_request(self._app, *key))
 
     async def _get_collection_exercise(self):
-        url = self._collex_url + self._collex_id
-        return await self._make_request(Request("GET", url, self._app['COLLECTION_EXERCISE_AUTH'], handle_response))
+        key = ("collection_exercise", self._collex_id)
+        return await self._make_cached_request(key, reference_request(self._app, *key))
 
     async def _get_collection_exercise_events(self):
-        url = self._collex_url + self._collex_id + "/events"
-        return await self._make_request(Request("GET", url, self._app['COLLECTION_EXERCISE_AUTH'], handle_response))
+        key = ("collection_exercise_events", self._collex_id)
+        return await self._make_cached_request(key, reference_request(self._app, *key))
 
     def _get_collex_event_dates(self):
         return {
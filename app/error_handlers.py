@@ -1,12 +1,12 @@
 import logging
 
-import aiohttp_jinja2
 from aiohttp import web
 from aiohttp.client_exceptions import (
     ClientResponseError, ClientConnectorError, ClientConnectionError, ContentTypeError)
 from structlog import wrap_logger
 
-from .exceptions import ExerciseClosedError, CompletedCaseError, InvalidEqPayLoad, InactiveIACError
+from .exceptions import (
+    CircuitOpenError, DeadlineExceededError, ExerciseClosedError, CompletedCaseError, InvalidEqPayLoad, InactiveIACError)
 
 logger = wrap_logger(logging.getLogger("respondent-home"))
 
@@ -33,6 +33,10 @@ def create_error_middleware(overrides):
             return await ce_closed(request, ex.collection_exercise_id)
         except InvalidEqPayLoad as ex:
             return await eq_error(request, ex.message)
+        except CircuitOpenError as ex:
+            return await circuit_open_error(request, ex.service)
+        except DeadlineExceededError as ex:
+            return await deadline_exceeded(request, ex.seconds)
         except ClientConnectionError as ex:
             return await connection_error(request, ex.args[0])
         except ClientConnectorError as ex:
@@ -47,40 +51,59 @@ def create_error_middleware(overrides):
 
 async def completed_case(request):
     logger.info("Attempt to use an inactive iac for a completed case")
-    return aiohttp_jinja2.render_template("completed.html", request, {})
+    request.app.metrics.launch_outcome('completed')
+    return request.app.page_cache.render("completed.html", request)
 
 
 async def inactive_iac(request):
     logger.info("Attempt to use an iac code that is inactive, malformed or iac_details missing active field")
-    return aiohttp_jinja2.render_template("inactive-iac.html", request, {})
+    request.app.metrics.launch_outcome('inactive')
+    return request.app.page_cache.render("inactive-iac.html", request)
 
 
 async def ce_closed(request, collex_id):
     logger.info("Attempt to access collection exercise that has already ended", collex_id=collex_id)
-    return aiohttp_jinja2.render_template("closed.html", request, {})
+    request.app.metrics.launch_outcome('closed')
+    return request.app.page_cache.render("closed.html", request)
 
 
 async def eq_error(request, message: str):
     logger.error("Service failed to build eQ payload", message=message)
-    return aiohttp_jinja2.render_template("error.html", request, {}, status=500)
+    request.app.metrics.launch_outcome('invalid')
+    return request.app.page_cache.render("error.html", request, status=500)
 
 
 async def connection_error(request, message: str):
     logger.error("Service connection error", message=message)
-    return aiohttp_jinja2.render_template("error.html", request, {}, status=500)
+    request.app.metrics.launch_outcome('upstream_error')
+    return request.app.page_cache.render("error.html", request, status=500)
+
+
+async def circuit_open_error(request, service: str):
+    logger.warn("Service circuit open, failing fast", service_name=service)
+    request.app.metrics.launch_outcome('upstream_error')
+    return request.app.page_cache.render("error.html", request, status=503)
+
+
+async def deadline_exceeded(request, seconds: float):
+    logger.error("Request deadline exceeded waiting for services", deadline=seconds)
+    request.app.metrics.launch_outcome('timed_out')
+    return request.app.page_cache.render("error.html", request, status=504)
 
 
 async def payload_error(request, url: str):
     logger.error("Service failed to return expected JSON payload", url=url)
-    return aiohttp_jinja2.render_template("error.html", request, {}, status=500)
+    request.app.metrics.launch_outcome('upstream_error')
+    return request.app.page_cache.render("error.html", request, status=500)
 
 
 async def response_error(request):
-    return aiohttp_jinja2.render_template("error.html", request, {}, status=500)
+    request.app.metrics.launch_outcome('upstream_error')
+    return request.app.page_cache.render("error.html", request, status=500)
 
 
 async def not_found_error(request):
-    return aiohttp_jinja2.render_template("404.html", request, {}, status=404)
+    return request.app.page_cache.render("404.html", request, status=404)
 
 
 def setup(app):
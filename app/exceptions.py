@@ -1,3 +1,12 @@
+import asyncio
+
+import aioredis
+
+
+# Errors from a redis command that mean redis can't be used right now, which callers log and work around
+REDIS_ERRORS = (OSError, asyncio.TimeoutError, aioredis.RedisError)
+
+
 class CompletedCaseError(Exception):
     """Raised when a user enters a IAC code for a completed case"""
 
@@ -17,6 +26,22 @@ class InvalidIACError(Exception):
     """Raised when the IAC Service returns a 404"""
 
 
+class CircuitOpenError(Exception):
+    """Raised instead of making a request to a service whose circuit breaker is open"""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request has used up its time budget for upstream calls"""
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+
+
 class ExerciseClosedError(Exception):
     """Raised when a user attempts to access an already ended CE"""
 
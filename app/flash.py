@@ -1,14 +1,14 @@
-import json
 import logging
 from copy import deepcopy
 from functools import partial
 
-import redis
 from structlog import wrap_logger
 
 from aiohttp import web
 from aiohttp_session import get_session
 
+from .session import uses_session
+
 
 SESSION_KEY = REQUEST_KEY = "flash"
 
@@ -30,13 +30,16 @@ def flash(request, message, position=None):
 
 
 def pop_flash(request):
-    flashed_message = request[REQUEST_KEY]
+    flashed_message = request.get(REQUEST_KEY, [])
     request[REQUEST_KEY] = []
     return flashed_message
 
 
 @web.middleware
 async def flash_middleware(request, handler):
+    if not uses_session(request):
+        return await handler(request)
+
     session = await get_session(request)
     flash_incoming = MessageList(session.get(SESSION_KEY, []))
     request[REQUEST_KEY] = deepcopy(flash_incoming)  # copy flash for modification
@@ -54,19 +57,12 @@ async def flash_middleware(request, handler):
 
 @web.middleware
 async def maintenance_middleware(request, handler):
-    try:
-        maintenance_message = request.app.redis_connection.get(request.app['REDIS_MAINTENANCE_KEY'])
-        if maintenance_message:
-            maintenance_ttl = request.app.redis_connection.ttl(request.app['REDIS_MAINTENANCE_KEY'])
-            maintenance_message = json.loads(maintenance_message)
-            logger.info('Maintenance message received from redis',
-                        message=maintenance_message['text'],
-                        ttl=maintenance_ttl)
-            flash(request, maintenance_message, position=0)
-    except redis.exceptions.ConnectionError as e:
-        logger.error('Failed to connect to redis', message=str(e))
-    except TypeError as e:
-        logger.error('Unexpected message type received from redis', message=str(e))
+    if not uses_session(request):
+        return await handler(request)
+
+    maintenance_message = request.app.maintenance.message
+    if maintenance_message:
+        flash(request, maintenance_message, position=0)
     return await handler(request)
 
 
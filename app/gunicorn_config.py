@@ -0,0 +1,26 @@
+"""
+Gunicorn settings, used with `gunicorn -c python:app.gunicorn_config`.
+
+The workers share one port, so their Prometheus metrics are kept in prometheus_client multiprocess mode and combined
+on every scrape of /metrics.
+"""
+import os
+import shutil
+import tempfile
+
+
+def reset_multiprocess_dir(multiprocess_dir: str):
+    """Clears out the figures left by workers from a previous run"""
+    shutil.rmtree(multiprocess_dir, ignore_errors=True)
+    os.makedirs(multiprocess_dir)
+
+
+# NB: done when gunicorn loads this file, as under --preload the app (and so its metrics) is created in the master
+# before any server hook runs, and prometheus_client picks its mode when first imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'respondent-home-metrics'))
+reset_multiprocess_dir(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
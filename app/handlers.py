@@ -1,24 +1,39 @@
 import logging
+import time
+import uuid
+from contextlib import contextmanager
 
 import aiohttp_jinja2
 from aiohttp.client_exceptions import ClientConnectionError, ClientConnectorError, ClientResponseError
 from aiohttp.web import HTTPFound, RouteTableDef, json_response
-from sdc.crypto.encrypter import encrypt
+from aiohttp_session import get_session
 from structlog import wrap_logger
 
 from . import (
     BAD_CODE_MSG, BAD_CODE_TYPE_MSG, BAD_RESPONSE_MSG, INVALID_CODE_MSG, NOT_AUTHORIZED_MSG, VERSION)
-from .case import get_case, post_case_event
+from .case import get_case
+from .deadline import Deadline
 from .eq import EqPayloadConstructor
 from .exceptions import CompletedCaseError, InvalidIACError, InactiveIACError
 from .flash import flash
+from .rate_limit import client_address
 
 
 logger = wrap_logger(logging.getLogger("respondent-home"))
 routes = RouteTableDef()
 
+WAITING_ROOM_SESSION_KEY = 'waiting_room'
 
-@routes.view('/info', use_prefix=False)
+
+@routes.view('/metrics', use_prefix=False, use_session=False)
+class Metrics:
+
+    @staticmethod
+    async def get(request):
+        return request.app.metrics.render()
+
+
+@routes.view('/info', use_prefix=False, use_session=False)
 class Info:
 
     @staticmethod
@@ -26,28 +41,81 @@ class Info:
         info = {
             "name": 'respondent-home-ui',
             "version": VERSION,
+            "reference_cache": request.app.reference_cache.stats,
+            "upstream": request.app.upstream.stats,
+            "circuit_breakers": {service: breaker.stats for service, breaker in request.app.upstream.breakers.items()},
+            "connection_pools": {service: pool.stats for service, pool in request.app.upstream.pools.items()},
+            "hedging": {service: hedge.stats for service, hedge in request.app.upstream.hedges.items()},
+            "admission": request.app.admission.stats,
+            "cache_warmup": request.app.cache_warmer.stats,
+            "page_cache": request.app.page_cache.stats,
+            "waiting_room": {"rate": request.app.waiting_room.rate, "queued": request.app.waiting_room.queued},
         }
         if 'check' in request.query:
-            info["ready"] = await request.app.check_services()
+            info["ready"] = await request.app.check_services() and request.app.cache_warmer.done
+            info["services"] = request.app.service_health.results
         return json_response(info)
 
 
-@routes.view('/')
-class Index:
+class LaunchContext:
+    """
+    Per-request state for a launch, passed through the launch pipeline.
+
+    The Index view is instantiated once and shared by every request, so nothing request specific can be stored on it.
+    """
 
-    def __init__(self):
+    __slots__ = ('request', 'iac', 'client_ip', 'timings', 'started', 'deadline')
+
+    def __init__(self, request):
+        self.request = request
         self.iac = None
-        self.request = None
+        self.client_ip = client_address(request)
+        self.timings = []
+        self.started = time.perf_counter()
+        self.deadline = Deadline(request.app['LAUNCH_DEADLINE'])
 
     @property
-    def client_ip(self):
-        if not hasattr(self, '_client_ip'):
-            self._client_ip = self.request.headers.get("X-Forwarded-For")
-        return self._client_ip
+    def app(self):
+        return self.request.app
 
-    @property
-    def iac_url(self):
-        return f"{self.request.app['IAC_URL']}/iacs/{self.iac}"
+    @contextmanager
+    def stage(self, name):
+        """Records the time taken by a stage of the launch as a (name, seconds) pair"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.perf_counter() - start))
+
+    def server_timing(self) -> str:
+        """The recorded stages, and the total so far, as a Server-Timing header value in milliseconds"""
+        timings = self.timings + [('total', time.perf_counter() - self.started)]
+        return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
+
+
+async def add_server_timing(request, response):
+    """Adds the stage timings of a launch to its response, whether that is the redirect to eQ or an error page"""
+    context = request.get('launch_context')
+    if context is not None and request.app['SERVER_TIMING']:
+        response.headers['Server-Timing'] = context.server_timing()
+
+
+async def add_cache_control(request, response):
+    """Adds the Cache-Control declared for the route to its successful GET responses"""
+    resource = request.match_info.route.resource
+    if resource is None or request.method not in ('GET', 'HEAD') or response.status not in (200, 304):
+        return
+    cache_control = request.app.cache_control.get(resource.name)
+    if cache_control:
+        response.headers.setdefault('Cache-Control', cache_control)
+
+
+@routes.view('/', cache_control='INDEX_CACHE_CONTROL')
+class Index:
+
+    @staticmethod
+    def iac_url(context):
+        return f"{context.app['IAC_URL']}/iacs/{context.iac}"
 
     @staticmethod
     def join_iac(data, expected_length=12):
@@ -78,117 +146,190 @@ class Index:
             logger.info('Attempt to use inactive iac for incomplete case', collex_id=collex_id)
             raise InactiveIACError
 
-    def check_case_sample_unit_type_valid(self, case_json):
+    @staticmethod
+    def check_case_sample_unit_type_valid(context, case_json):
         try:
             assert case_json['sampleUnitType'] == 'H'
         except AssertionError:
             logger.warn('Attempt to use unexpected sample unit type', sample_unit_type=case_json['sampleUnitType'])
-            flash(self.request, BAD_CODE_TYPE_MSG)
+            flash(context.request, BAD_CODE_TYPE_MSG)
             return False
         except KeyError:
-            logger.error('sampleUnitType missing from case response', client_ip=self.client_ip)
-            flash(self.request, BAD_RESPONSE_MSG)
+            logger.error('sampleUnitType missing from case response', client_ip=context.client_ip)
+            flash(context.request, BAD_RESPONSE_MSG)
             return False
 
         return True
 
-    def redirect(self):
-        raise HTTPFound(self.request.app.router['Index:get'].url_for())
+    @staticmethod
+    def redirect(request):
+        raise HTTPFound(request.app.router['Index:get'].url_for())
 
-    async def get_token(self, case_json):
-        eq_payload = await EqPayloadConstructor(case_json, self.request.app, self.iac).build()
-        return encrypt(eq_payload, key_store=self.request.app['key_store'], key_purpose="authentication")
+    @staticmethod
+    async def get_token(context, case_json):
+        with context.stage('payload'):
+            eq_payload = await EqPayloadConstructor(case_json, context.app, context.iac, context.deadline).build()
+        with context.stage('encrypt'), context.app.metrics.token_encryption.time():
+            return await context.app['token_encrypter'].encrypt(eq_payload)
 
-    async def get_iac_details(self):
-        logger.debug(f"Making GET request to {self.iac_url}", iac=self.iac, client_ip=self.client_ip)
+    @staticmethod
+    def invalid_iac(context):
+        logger.info("Attempt to use an invalid access code", client_ip=context.client_ip)
+        flash(context.request, INVALID_CODE_MSG)
+        return aiohttp_jinja2.render_template("index.html", context.request, {}, status=202)
+
+    async def get_iac_details(self, context):
+        iac_url = self.iac_url(context)
+        logger.debug(f"Making GET request to {iac_url}", iac=context.iac, client_ip=context.client_ip)
         try:
-            async with self.request.app.http_session_pool.get(self.iac_url, auth=self.request.app["IAC_AUTH"]) as resp:
-                logger.debug("Received response from IAC", iac=self.iac, status_code=resp.status)
-
-                try:
-                    resp.raise_for_status()
-                except ClientResponseError as ex:
-                    if resp.status == 404:
-                        raise InvalidIACError
-                    elif resp.status in (401, 403):
-                        logger.info("Unauthorized access to IAC service attempted", client_ip=self.client_ip)
-                        flash(self.request, NOT_AUTHORIZED_MSG)
-                        return self.redirect()
-                    elif 400 <= resp.status < 500:
-                        logger.warn(
-                            "Client error when accessing IAC service",
-                            client_ip=self.client_ip,
-                            status=resp.status,
-                        )
-                        flash(self.request, BAD_RESPONSE_MSG)
-                        return self.redirect()
-                    else:
-                        logger.error("Error in response", url=resp.url, status_code=resp.status)
-                        raise ex
+            resp = await context.app.upstream.get(iac_url, auth=context.app["IAC_AUTH"], deadline=context.deadline)
+            logger.debug("Received response from IAC", iac=context.iac, status_code=resp.status)
+
+            try:
+                resp.raise_for_status()
+            except ClientResponseError as ex:
+                if resp.status == 404:
+                    await context.app.unknown_iacs.add(context.iac)
+                    raise InvalidIACError
+                elif resp.status in (401, 403):
+                    logger.info("Unauthorized access to IAC service attempted", client_ip=context.client_ip)
+                    flash(context.request, NOT_AUTHORIZED_MSG)
+                    return self.redirect(context.request)
+                elif 400 <= resp.status < 500:
+                    logger.warn(
+                        "Client error when accessing IAC service",
+                        client_ip=context.client_ip,
+                        status=resp.status,
+                    )
+                    flash(context.request, BAD_RESPONSE_MSG)
+                    return self.redirect(context.request)
                 else:
-                    return await resp.json()
+                    logger.error("Error in response", url=resp.url, status_code=resp.status)
+                    raise ex
+            else:
+                return await resp.json()
         except (ClientConnectionError, ClientConnectorError) as ex:
-            logger.error("Client failed to connect to iac service", client_ip=self.client_ip)
+            logger.error("Client failed to connect to iac service", client_ip=context.client_ip)
             raise ex
 
-    @aiohttp_jinja2.template('index.html')
-    async def get(self, _):
-        return {}
+    async def get(self, request):
+        return request.app.page_cache.render('index.html', request)
 
     @aiohttp_jinja2.template('index.html')
     async def post(self, request):
         """
         Main entry point to building an eQ payload as URL parameter.
         """
-        self.request = request
-        data = await self.request.post()
+        context = request['launch_context'] = LaunchContext(request)
+        data = await request.post()
 
         try:
-            self.iac = self.join_iac(data)
+            context.iac = self.join_iac(data)
         except TypeError:
-            logger.warn("Attempt to use a malformed access code", client_ip=self.client_ip)
-            flash(self.request, BAD_CODE_MSG)
-            return self.redirect()
-
+            logger.warn("Attempt to use a malformed access code", client_ip=context.client_ip)
+            flash(request, BAD_CODE_MSG)
+            return self.redirect(request)
+
+        # NB: checked before a waiting room slot is taken, so codes already known to be invalid don't hold anyone up
+        if await request.app.unknown_iacs.contains(context.iac):
+            logger.debug("Access code already known to be invalid", client_ip=context.client_ip)
+            return self.invalid_iac(context)
+
+        slot = await request.app.waiting_room.ticket()
+        if slot is not None:
+            session = await get_session(request)
+            session[WAITING_ROOM_SESSION_KEY] = {'iac': context.iac, 'slot': slot, 'id': uuid.uuid4().hex}
+            logger.info('Launch queued in waiting room', client_ip=context.client_ip,
+                        wait=request.app.waiting_room.wait(slot))
+            # NB: returned rather than raised, as some aiohttp versions drop the cookies of a raised response
+            return HTTPFound(request.app.router['WaitingRoom:get'].url_for())
+
+        return await self.launch(context)
+
+    async def launch(self, context):
+        """
+        Looks up the access code in the context and redirects to eQ with a launch token for its case.
+        """
+        request = context.request
         try:
-            iac_json = await self.get_iac_details()
+            with context.stage('iac'):
+                iac_json = await self.get_iac_details(context)
         except InvalidIACError:
-            logger.info("Attempt to use an invalid access code", client_ip=self.client_ip)
-            flash(self.request, INVALID_CODE_MSG)
-            return aiohttp_jinja2.render_template("index.html", self.request, {}, status=202)
+            return self.invalid_iac(context)
 
         try:
             case_id = iac_json["caseId"]
         except KeyError:
-            logger.error('caseId missing from IAC response', client_ip=self.client_ip)
-            flash(self.request, BAD_RESPONSE_MSG)
+            logger.error('caseId missing from IAC response', client_ip=context.client_ip)
+            flash(request, BAD_RESPONSE_MSG)
             return {}
 
-        case_json = await get_case(case_id, self.request.app)
+        with context.stage('case'):
+            case_json = await get_case(case_id, request.app, context.deadline)
 
         self.validate_iac_active(iac_json, case_json)
 
-        if not self.check_case_sample_unit_type_valid(case_json):
+        if not self.check_case_sample_unit_type_valid(context, case_json):
             return {}
 
-        token = await self.get_token(case_json)
+        token = await self.get_token(context, case_json)
 
         description = f"Instrument LMS launched for case {case_id}"
-        await post_case_event(case_id, 'EQ_LAUNCH', description, self.request.app)
+        with context.stage('case_event'):
+            await request.app.case_events.enqueue(case_id, 'EQ_LAUNCH', description, deadline=context.deadline)
+
+        request.app.metrics.launch_outcome('launched')
+        logger.info('Redirecting to eQ', client_ip=context.client_ip)
+        raise HTTPFound(f"{request.app['EQ_URL']}/session?token={token}")
+
 
-        logger.info('Redirecting to eQ', client_ip=self.client_ip)
-        raise HTTPFound(f"{self.request.app['EQ_URL']}/session?token={token}")
+@routes.view('/waiting-room')
+class WaitingRoom:
+    """
+    Holds a queued launch until its slot comes round.
 
+    The page refreshes itself while the launch waits, then submits a form carrying the ticket's id, and only that POST
+    launches, so a prefetch or a second tab can't launch it, or post its case event, again.
+    """
 
-@routes.view('/cookies-privacy')
+    async def get(self, request):
+        session = await get_session(request)
+        ticket = session.get(WAITING_ROOM_SESSION_KEY)
+        if ticket is None:
+            return Index.redirect(request)
+
+        waiting_room = request.app.waiting_room
+        return aiohttp_jinja2.render_template('waiting-room.html', request, {
+            'ready': waiting_room.wait(ticket['slot']) <= 0,
+            'ticket': ticket['id'],
+            'refresh': waiting_room.refresh_after(ticket['slot']),
+            'position': waiting_room.position(ticket['slot']),
+        })
+
+    @aiohttp_jinja2.template('index.html')
+    async def post(self, request):
+        session = await get_session(request)
+        ticket = session.get(WAITING_ROOM_SESSION_KEY)
+        data = await request.post()
+        if ticket is None or data.get('ticket') != ticket['id']:
+            return Index.redirect(request)
+        if request.app.waiting_room.wait(ticket['slot']) > 0:
+            raise HTTPFound(request.app.router['WaitingRoom:get'].url_for())
+
+        del session[WAITING_ROOM_SESSION_KEY]
+        context = request['launch_context'] = LaunchContext(request)
+        context.iac = ticket['iac']
+        logger.info('Launch admitted from waiting room', client_ip=context.client_ip)
+        return await Index().launch(context)
+
+
+@routes.view('/cookies-privacy', cache_control='STATIC_PAGE_CACHE_CONTROL')
 class CookiesPrivacy:
-    @aiohttp_jinja2.template('cookies-privacy.html')
-    async def get(self, _):
-        return {}
+    async def get(self, request):
+        return request.app.page_cache.render('cookies-privacy.html', request)
 
 
-@routes.view('/contact-us')
+@routes.view('/contact-us', cache_control='STATIC_PAGE_CACHE_CONTROL')
 class ContactUs:
-    @aiohttp_jinja2.template('contact-us.html')
-    async def get(self, _):
-        return {}
+    async def get(self, request):
+        return request.app.page_cache.render('contact-us.html', request)
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+
+from aiohttp.client_exceptions import ClientError, ClientResponseError
+from structlog import wrap_logger
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+class ServiceHealthCheck:
+    """
+    Checks the /info endpoint of every required service, for readiness probes.
+
+    The services are checked concurrently, each with its own `timeout`, and the results are reused for `cache_ttl`
+    seconds so that probes from many pods don't each fan out to every service. Probes that arrive while a check is
+    running wait for that check rather than starting another.
+    """
+
+    def __init__(self, app, urls: dict, timeout: float, cache_ttl: float, timer=time.monotonic):
+        self.urls = urls
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.results = {}
+        self._app = app
+        self._timer = timer
+        self._checked_at = None
+        self._pending = None
+
+    @property
+    def healthy(self) -> bool:
+        return all(result['healthy'] for result in self.results.values())
+
+    async def _check_service(self, service_name: str, url: str) -> dict:
+        logger.info(f"Making health check GET request to {url}")
+        status = None
+        start = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(self._get_status(url), self.timeout)
+        except ClientResponseError as e:
+            status = e.status
+        except (ClientError, asyncio.TimeoutError):
+            pass
+        healthy = status is not None and status < 400
+        if not healthy:
+            logger.error('Failed to connect to required service', config=service_name, url=url, status=status)
+        return {
+            "healthy": healthy,
+            "status": status,
+            "latency": round(time.perf_counter() - start, 3),
+        }
+
+    async def _get_status(self, url: str) -> int:
+        async with self._app.http_session_pool.get(url) as resp:
+            resp.raise_for_status()
+            return resp.status
+
+    async def _check_all(self):
+        try:
+            services = list(self.urls)
+            results = await asyncio.gather(*[self._check_service(service_name, self.urls[service_name])
+                                             for service_name in services])
+            self.results = dict(zip(services, results))
+            self._checked_at = self._timer()
+        finally:
+            self._pending = None
+
+    async def check(self) -> dict:
+        """Results of the last check, checking the services again if they are older than `cache_ttl`"""
+        if self._checked_at is not None and self._timer() - self._checked_at < self.cache_ttl:
+            return self.results
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._check_all())
+        # NB: shielded so one probe giving up doesn't cancel the check for everyone waiting on it
+        await asyncio.shield(self._pending)
+        return self.results
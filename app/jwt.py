@@ -1,12 +1,22 @@
+import asyncio
 import json
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 
+from sdc.crypto.encrypter import encrypt
 from sdc.crypto.key_store import KeyStore
 from sdc.crypto.key_store import validate_required_keys
 from structlog import wrap_logger
 
 logger = wrap_logger(logging.getLogger('respondent-home'))
 
+EXECUTORS = ('process', 'thread', 'inline')
+
+# NB: set just before a process pool is created, so its processes inherit it when they are forked. ProcessPoolExecutor
+# has no initializer in python 3.6, and passing the keys with every token would pickle them every time
+_process_key_store = None
+
 
 def key_store(keys: str) -> KeyStore:
     secrets = json.loads(keys)
@@ -15,3 +25,49 @@ def key_store(keys: str) -> KeyStore:
     validate_required_keys(secrets, "authentication")
 
     return KeyStore(secrets)
+
+
+def _encrypt_in_process(payload: dict) -> str:
+    """Runs in a pool process, with the KeyStore it inherited from the worker"""
+    return encrypt(payload, key_store=_process_key_store, key_purpose="authentication")
+
+
+class TokenEncrypter:
+    """
+    Mints eQ launch tokens off the event loop.
+
+    Signing and encrypting a token is CPU bound, so by default it is done in a pool of `max_workers` threads. A pool
+    of processes ('process') sidesteps the GIL, but adds `max_workers` processes to every gunicorn worker, so it is
+    opt-in. The event loop itself ('inline') can be used too.
+    """
+
+    def __init__(self, keys: str, executor: str = 'thread', max_workers: int = 2):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown token executor '{executor}', expected one of {', '.join(EXECUTORS)}")
+        self.key_store = key_store(keys)
+        self.executor = executor
+        self.max_workers = max_workers
+        self._pool = None
+
+    async def encrypt(self, payload: dict) -> str:
+        if self.executor == 'inline':
+            return encrypt(payload, key_store=self.key_store, key_purpose="authentication")
+
+        if self._pool is None:
+            if self.executor == 'process':
+                global _process_key_store
+                _process_key_store = self.key_store
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        loop = asyncio.get_event_loop()
+        if self.executor == 'process':
+            return await loop.run_in_executor(self._pool, _encrypt_in_process, payload)
+        return await loop.run_in_executor(
+            self._pool, partial(encrypt, payload, key_store=self.key_store, key_purpose="authentication"))
+
+    async def stop(self, app):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import time
+
+import aioredis
+from structlog import wrap_logger
+
+from .exceptions import REDIS_ERRORS
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+RESUBSCRIBE_DELAY = 1
+
+
+class MaintenanceMonitor:
+    """
+    Worker-local snapshot of the planned maintenance message held in redis.
+
+    The snapshot is refreshed whenever scripts/planned_maintenance.py publishes on the maintenance channel, and polled
+    every `poll_interval` seconds in case a notification is missed, so requests never need to go to redis themselves.
+    A `poll_interval` of 0 disables the monitor, leaving the snapshot to be set with `update`.
+    """
+
+    def __init__(self, app, poll_interval: float, timer=time.monotonic):
+        self.poll_interval = poll_interval
+        self._app = app
+        self._timer = timer
+        self._message = None
+        self._expires_at = None
+        self._task = None
+        self._stopping = None
+
+    @property
+    def message(self):
+        if self._message is None:
+            return None
+        if self._expires_at is not None and self._expires_at <= self._timer():
+            return None
+        return self._message
+
+    def update(self, message, ttl=None):
+        self._message = message
+        self._expires_at = self._timer() + ttl if ttl is not None and ttl >= 0 else None
+
+    async def refresh(self):
+        redis_connection = self._app.redis_connection
+        key = self._app['REDIS_MAINTENANCE_KEY']
+        try:
+            maintenance_message = await redis_connection.get(key)
+            if not maintenance_message:
+                if self._message is not None:
+                    logger.info('Maintenance message removed')
+                self.update(None)
+                return
+            maintenance_ttl = await redis_connection.ttl(key)
+            maintenance_message = json.loads(maintenance_message)
+            text = maintenance_message['text']
+        except REDIS_ERRORS as e:
+            logger.error('Failed to connect to redis', message=str(e))
+            return
+        except (TypeError, ValueError, KeyError) as e:
+            logger.error('Unexpected message type received from redis', message=str(e))
+            return
+
+        if maintenance_message != self._message:
+            logger.info('Maintenance message received from redis',
+                        message=text,
+                        ttl=maintenance_ttl)
+        self.update(maintenance_message, ttl=maintenance_ttl)
+
+    async def watch(self):
+        while not self._stopping.is_set():
+            try:
+                delay = await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # NB: logged and retried, as nothing would refresh the snapshot again if the task died
+                logger.exception('Unexpected error watching for maintenance notifications')
+                delay = RESUBSCRIBE_DELAY
+            await self._sleep(delay)
+
+    async def _listen(self) -> float:
+        """Refreshes the snapshot on every notification until the subscription is lost, returning when to retry"""
+        address = (self._app['REDIS_HOST'], self._app['REDIS_PORT'])
+        channel_name = self._app['REDIS_MAINTENANCE_CHANNEL']
+        try:
+            connection = await aioredis.create_redis(address, timeout=self._app['REDIS_TIMEOUT'])
+        except REDIS_ERRORS as e:
+            logger.warning('Failed to subscribe to maintenance notifications', message=str(e))
+            await self.refresh()
+            return self.poll_interval
+
+        try:
+            channel, = await connection.subscribe(channel_name)
+            await self.refresh()  # pick up any change made before the subscription was in place
+            while not self._stopping.is_set():
+                try:
+                    received = await asyncio.wait_for(channel.wait_message(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    await self.refresh()
+                    continue
+                if not received:
+                    logger.warning('Maintenance notification channel closed')
+                    break
+                await channel.get()
+                await self.refresh()
+        except REDIS_ERRORS as e:
+            logger.warning('Lost maintenance notification subscription', message=str(e))
+        finally:
+            connection.close()
+            await connection.wait_closed()
+        return RESUBSCRIBE_DELAY
+
+    async def _sleep(self, delay):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def start(self, app):
+        if not self.poll_interval:
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.ensure_future(self.watch())
+
+    async def stop(self, app):
+        if self._task is None:
+            return
+        # NB: the event ends the loop even if the cancellation is swallowed while a redis connection is being opened
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
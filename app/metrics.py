@@ -0,0 +1,68 @@
+import os
+import time
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+
+LAUNCH_OUTCOMES = ('launched', 'completed', 'inactive', 'closed', 'invalid', 'upstream_error', 'timed_out', 'rate_limited', 'shed')
+
+
+class Metrics:
+    """
+    Prometheus metrics for one app.
+
+    Each app has its own registry, so apps created side by side (as the tests do) don't clash. Under gunicorn the
+    workers share a port, so a scrape reaches whichever worker accepts it. The workers therefore run in
+    prometheus_client multiprocess mode (see app/gunicorn_config.py): each writes its figures to
+    PROMETHEUS_MULTIPROC_DIR, and /metrics serves the figures of every worker combined.
+    """
+
+    def __init__(self):
+        self.multiprocess_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+        self.registry = CollectorRegistry()
+        self.request_latency = Histogram(
+            'respondent_home_request_seconds', 'Time taken to handle a request',
+            ['route', 'method', 'status'], registry=self.registry)
+        self.upstream_latency = Histogram(
+            'respondent_home_upstream_request_seconds', 'Time taken by requests to the RM services',
+            ['service', 'method', 'status'], registry=self.registry)
+        self.token_encryption = Histogram(
+            'respondent_home_token_encryption_seconds', 'Time taken to mint an eQ launch token',
+            registry=self.registry)
+        self.launch_outcomes = Counter(
+            'respondent_home_launch_outcomes', 'Outcomes of launch attempts',
+            ['outcome'], registry=self.registry)
+        for outcome in LAUNCH_OUTCOMES:
+            self.launch_outcomes.labels(outcome)
+
+    def observe_upstream(self, service: str, method: str, status, seconds: float):
+        self.upstream_latency.labels(service, method, str(status)).observe(seconds)
+
+    def launch_outcome(self, outcome: str):
+        self.launch_outcomes.labels(outcome).inc()
+
+    def render(self) -> web.Response:
+        registry = self.registry
+        if self.multiprocess_dir:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=self.multiprocess_dir)
+        return web.Response(body=generate_latest(registry), headers={'Content-Type': CONTENT_TYPE_LATEST})
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as ex:
+        status = ex.status
+        raise
+    finally:
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        request.app.metrics.request_latency.labels(route, request.method, str(status)).observe(
+            time.perf_counter() - start)
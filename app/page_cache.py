@@ -0,0 +1,89 @@
+import hashlib
+import secrets
+
+import aiohttp_jinja2
+from aiohttp import web
+
+from .flash import REQUEST_KEY
+
+
+# NB: made of the same characters as a real nonce, so autoescaping leaves it alone
+NONCE_PLACEHOLDER = 'nonce' + secrets.token_hex(16)
+
+# Templates that show flashed messages, which are rendered in full while there are messages waiting to be shown
+FLASH_TEMPLATES = ('index.html',)
+
+
+class PageCache:
+    """
+    Rendered copies of the pages that are the same for every request apart from their CSP nonce.
+
+    Each page is rendered once with a placeholder nonce and kept as the bytes either side of it, so serving it again
+    only joins those around the request's own nonce. Pages in FLASH_TEMPLATES are rendered in full while there are
+    flashed messages waiting to be shown, as are all pages while `enabled` is False.
+
+    Cached pages served to a GET get a strong ETag made from the page as rendered with the placeholder, which only
+    changes with the templates or the app's configuration. Their Cache-Control is set by `add_cache_control`. A GET
+    whose If-None-Match has that ETag gets a 304.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._pages = {}
+
+    def _render(self, template_name: str, request) -> list:
+        nonce = request.csp_nonce
+        request.csp_nonce = NONCE_PLACEHOLDER
+        try:
+            text = aiohttp_jinja2.render_string(template_name, request, {})
+        finally:
+            request.csp_nonce = nonce
+        return [part.encode() for part in text.split(NONCE_PLACEHOLDER)]
+
+    @staticmethod
+    def etag(parts: list) -> str:
+        # NB: the placeholder is random per process, or per master under --preload, so it differs between instances
+        # and restarts. It is left out so that every instance gives the same ETag
+        return '"{}"'.format(hashlib.sha1(b'\0'.join(parts)).hexdigest())
+
+    @staticmethod
+    def not_modified(request, etag: str) -> bool:
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        # NB: If-None-Match uses the weak comparison, so a W/ prefix added by a proxy still matches
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in tags)
+
+    def render(self, template_name: str, request, status: int = 200) -> web.Response:
+        # NB: pages rendered without the context processors (after an error in an outer middleware) are left out
+        if (not self.enabled or aiohttp_jinja2.REQUEST_CONTEXT_KEY not in request
+                or (template_name in FLASH_TEMPLATES and request.get(REQUEST_KEY))):
+            return aiohttp_jinja2.render_template(template_name, request, {}, status=status)
+
+        page = self._pages.get(template_name)
+        if page is None:
+            self.misses += 1
+            parts = self._render(template_name, request)
+            page = self._pages[template_name] = (parts, self.etag(parts))
+        else:
+            self.hits += 1
+
+        parts, etag = page
+        headers = {}
+        if status == 200 and request.method in ('GET', 'HEAD'):
+            headers['ETag'] = etag
+            if self.not_modified(request, etag):
+                return web.Response(status=304, headers=headers)
+        return web.Response(body=request.csp_nonce.encode().join(parts), status=status,
+                            content_type='text/html', charset='utf-8', headers=headers)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._pages),
+        }
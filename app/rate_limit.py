@@ -0,0 +1,86 @@
+import logging
+import math
+import time
+import uuid
+
+import aiohttp_jinja2
+from aiohttp import web
+from structlog import wrap_logger
+
+from . import RATE_LIMITED_MSG
+from .exceptions import REDIS_ERRORS
+from .flash import flash
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+def client_address(request) -> str:
+    """
+    The client's address as seen by the outermost of the TRUSTED_PROXY_HOPS proxies in front of the app.
+
+    Each proxy appends the address it received the request from to X-Forwarded-For, so only the last
+    TRUSTED_PROXY_HOPS entries can be trusted: anything further left was sent by the client itself.
+    """
+    hops = request.app['TRUSTED_PROXY_HOPS']
+    forwarded_for = [address.strip() for address in request.headers.get("X-Forwarded-For", "").split(',')
+                     if address.strip()]
+    if hops and forwarded_for:
+        return forwarded_for[-min(hops, len(forwarded_for))]
+    return request.remote
+
+
+class RateLimiter:
+    """
+    Sliding window limit on how many access codes one client can submit, shared by every worker through redis.
+
+    Each attempt is recorded in a sorted set per client, scored by time, and a client that has made more than `limit`
+    attempts in the last `window` seconds is refused. Refused attempts count too, so a client has to stop for the
+    window to clear. Checks fail open if redis is unavailable. A `limit` of 0 disables the limiter.
+    """
+
+    key_prefix = 'respondent-home-ui:rate-limit'
+
+    def __init__(self, app, limit: int, window: float, timer=time.time):
+        self.limit = limit
+        self.window = window
+        self._app = app
+        self._timer = timer
+
+    def redis_key(self, client: str) -> str:
+        return ':'.join((self.key_prefix, client))
+
+    async def allow(self, client: str) -> bool:
+        if not self.limit:
+            return True
+        now = self._timer()
+        key = self.redis_key(client)
+        transaction = self._app.redis_connection.multi_exec()
+        transaction.zremrangebyscore(key, max=now - self.window)
+        transaction.zadd(key, now, f'{now}:{uuid.uuid4().hex}')
+        transaction.zcard(key)
+        transaction.expire(key, math.ceil(self.window))
+        try:
+            _, _, attempts, _ = await transaction.execute()
+        except REDIS_ERRORS as e:
+            logger.error('Failed to check rate limit in redis', message=str(e))
+            return True
+        return attempts <= self.limit
+
+
+@web.middleware
+async def rate_limit_middleware(request, handler):
+    resource = request.match_info.route.resource
+    if resource is None or resource.name != 'Index:post':
+        return await handler(request)
+
+    client = client_address(request)
+    if await request.app.rate_limiter.allow(client):
+        return await handler(request)
+
+    logger.warn('Client rate limited', client_ip=client)
+    request.app.metrics.launch_outcome('rate_limited')
+    flash(request, RATE_LIMITED_MSG)
+    response = aiohttp_jinja2.render_template("index.html", request, {}, status=429)
+    response.headers['Retry-After'] = str(math.ceil(request.app.rate_limiter.window))
+    return response
@@ -1,11 +1,24 @@
-from aiohttp_utils.routing import add_resource_context
+from aiohttp_utils.routing import add_resource_context, get_supported_method_names
 
 from .handlers import routes
 
 
 def setup(app, url_path_prefix):
-    """Set up routes as resources so we can use the `Index:get` notation for URL lookup."""
+    """Set up routes as resources so we can use the `Index:get` notation for URL lookup.
+
+    Routes declared with `use_session=False` are recorded in `app.sessionless_routes`, and are served without the
+    session, flash and maintenance middleware. Routes declared with `cache_control` name the config key holding the
+    Cache-Control for their GET responses, which are recorded in `app.cache_control`.
+    """
+    app.sessionless_routes = set()
+    app.cache_control = {}
     for route in routes:
         prefix = url_path_prefix if route.kwargs.get('use_prefix', True) else ''
+        resource = route.handler()
         with add_resource_context(app, module='app.handlers', url_prefix=prefix) as new_route:
-            new_route(route.path, route.handler())
+            new_route(route.path, resource)
+        if not route.kwargs.get('use_session', True):
+            app.sessionless_routes.update(app.router.get_default_handler_name(resource, method_name)
+                                          for method_name in get_supported_method_names(resource))
+        if 'cache_control' in route.kwargs:
+            app.cache_control[app.router.get_default_handler_name(resource, 'get')] = app[route.kwargs['cache_control']]
@@ -42,6 +42,9 @@ async def nonce_middleware(request, handler):
 
 async def on_prepare(request: web.BaseRequest, response: web.StreamResponse):
     for header, value in DEFAULT_RESPONSE_HEADERS.items():
+        if header == 'Content-Security-Policy' and response.status == 304:
+            # NB: the browser keeps the policy it stored with the page, whose nonce matches the page's scripts
+            continue
         if isinstance(value, dict):
             value = '; '.join([
                 f"{section} {' '.join(content)} 'nonce-{request.csp_nonce}'"
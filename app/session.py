@@ -1,5 +1,6 @@
 import base64
 
+from aiohttp import web
 from aiohttp_session import session_middleware
 from aiohttp_session.cookie_storage import EncryptedCookieStorage
 from cryptography import fernet
@@ -11,5 +12,20 @@ def generate_new_key():
     return base64.urlsafe_b64decode(fernet_key)
 
 
+def uses_session(request) -> bool:
+    """False for routes declared with `use_session=False`, such as the health probes"""
+    resource = request.match_info.route.resource
+    # NB: unmatched requests still need the session, as the not found page shows flashed messages
+    return resource is None or resource.name not in request.app.sessionless_routes
+
+
 def setup(secret_key):
-    return session_middleware(EncryptedCookieStorage(secret_key))
+    middleware = session_middleware(EncryptedCookieStorage(secret_key))
+
+    @web.middleware
+    async def optional_session_middleware(request, handler):
+        if not uses_session(request):
+            return await handler(request)
+        return await middleware(request, handler)
+
+    return optional_session_middleware
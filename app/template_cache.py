@@ -0,0 +1,51 @@
+"""
+Compiles the jinja2 templates ahead of time.
+
+With TEMPLATE_PRELOAD set, every template is compiled while the app is created, so no request pays for it, and the
+templates aren't checked for changes again. With TEMPLATE_BYTECODE_CACHE_DIR set, compiled templates are kept on disk
+and reused by every worker and restart. The cache can be filled at build time with:
+
+    python -m app.template_cache <directory>
+"""
+import logging
+import os
+import sys
+import time
+
+import jinja2
+from structlog import wrap_logger
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+EXTENSIONS = ['jinja2.ext.i18n']
+
+
+def environment_options(bytecode_cache_dir: str, preload: bool) -> dict:
+    """Options for the jinja2 environment. The build step uses the same ones, so its bytecode can be reused"""
+    options = {
+        'loader': jinja2.PackageLoader("app", "templates"),
+        'extensions': EXTENSIONS,
+        'auto_reload': not preload,
+    }
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        options['bytecode_cache'] = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+    return options
+
+
+def preload(env: jinja2.Environment) -> int:
+    """Compiles every template into the environment's cache, returning how many there are"""
+    start = time.perf_counter()
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    logger.info('Templates compiled', templates=len(names), seconds=round(time.perf_counter() - start, 3))
+    return len(names)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit('usage: python -m app.template_cache <directory>')
+    environment = jinja2.Environment(**environment_options(sys.argv[1], preload=True))
+    print(f'{preload(environment)} templates compiled into {sys.argv[1]}')
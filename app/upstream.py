@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import math
+import socket
+import time
+from collections import deque
+from functools import partial
+
+from aiohttp import BasicAuth, ClientResponse, ClientSession, ClientTimeout, TCPConnector, TraceConfig
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import AsyncResolver
+from structlog import wrap_logger
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+def parse_resolve(resolve: str) -> dict:
+    """
+    Parses pre-resolved addresses given as comma separated host:address pairs
+
+    :param resolve: e.g. "case.internal:10.0.0.5,iac.internal:10.0.0.6"
+    :return: dict of host to address
+    """
+    return dict(entry.strip().split(':', 1) for entry in resolve.split(',') if entry.strip())
+
+
+class StaticResolver(AbstractResolver):
+    """Resolves the configured hosts to fixed addresses and anything else with the wrapped resolver"""
+
+    def __init__(self, addresses: dict, resolver: AbstractResolver):
+        self.addresses = addresses
+        self._resolver = resolver
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        try:
+            address = self.addresses[host]
+        except KeyError:
+            return await self._resolver.resolve(host, port, family=family)
+        return [{'hostname': host, 'host': address, 'port': port,
+                 'family': family, 'proto': 0, 'flags': socket.AI_NUMERICHOST}]
+
+    async def close(self):
+        await self._resolver.close()
+
+
+class ConnectionPoolStats:
+    """
+    Collects connection pool metrics for a ClientSession through a TraceConfig.
+
+    Queue wait is the time a request spent waiting for a free connection slot, before any network activity.
+    """
+
+    def __init__(self):
+        self.queued = 0
+        self.queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.created = 0
+        self.reused = 0
+
+    def trace_config(self) -> TraceConfig:
+        trace_config = TraceConfig()
+        trace_config.on_connection_queued_start.append(self._on_queued_start)
+        trace_config.on_connection_queued_end.append(self._on_queued_end)
+        trace_config.on_connection_create_end.append(self._on_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_reuseconn)
+        return trace_config
+
+    async def _on_queued_start(self, session, context, params):
+        context.queued_at = time.perf_counter()
+
+    async def _on_queued_end(self, session, context, params):
+        wait = time.perf_counter() - context.queued_at
+        self.queued += 1
+        self.queue_wait += wait
+        self.max_queue_wait = max(self.max_queue_wait, wait)
+
+    async def _on_create_end(self, session, context, params):
+        self.created += 1
+
+    async def _on_reuseconn(self, session, context, params):
+        self.reused += 1
+
+    @property
+    def stats(self) -> dict:
+        connections = self.created + self.reused
+        return {
+            "queued": self.queued,
+            "queue_wait_mean": self.queue_wait / self.queued if self.queued else 0.0,
+            "queue_wait_max": self.max_queue_wait,
+            "created": self.created,
+            "reused": self.reused,
+            "reuse_ratio": self.reused / connections if connections else 0.0,
+        }
+
+
+class HedgePolicy:
+    """
+    Decides when a GET to a service should be hedged with a second attempt.
+
+    A request that has not been answered within `percentile` of the service's recent latencies is hedged. Each request
+    adds `max_rate` to a budget and each hedge spends one from it, so at most that fraction of requests are hedged and
+    a slow service never sees double the load. Nothing is hedged until `min_samples` latencies have been seen.
+    """
+
+    def __init__(self, percentile: float, max_rate: float, window: int = 100, min_samples: int = 20,
+                 max_budget: float = 10.0):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.max_budget = max_budget
+        self.hedged = 0
+        self.wins = 0
+        self._latencies = deque(maxlen=window)
+        self._budget = 0.0
+
+    @property
+    def delay(self):
+        """Seconds to wait for an answer before hedging, or None while there are too few samples"""
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[max(math.ceil(self.percentile / 100 * len(latencies)) - 1, 0)]
+
+    def observe(self, seconds: float):
+        self._latencies.append(seconds)
+
+    def request(self):
+        self._budget = min(self._budget + self.max_rate, self.max_budget)
+
+    def allow(self) -> bool:
+        if self._budget < 1:
+            return False
+        self._budget -= 1
+        self.hedged += 1
+        return True
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hedged": self.hedged,
+            "wins": self.wins,
+            "delay": self.delay,
+        }
+
+
+class UpstreamClient:
+    """
+    Makes GET requests to the RM services through the app's ClientSession, coalescing identical requests in flight.
+
+    Callers asking for the same URL with the same auth while a request is outstanding share its response rather than
+    each opening a connection. The body is read before the response is handed out, so every caller can use `.json()`.
+    The shared request is shielded, so a cancelled caller does not cancel it for the others.
+
+    Each service has a circuit breaker, matched on the service's base URL. Connection errors, timeouts and 5xx responses
+    count as failures, and while a breaker is open new requests to that service raise CircuitOpenError straight away.
+
+    Each service also has its own ClientSession and connection pool, so a slow service can only use up its own
+    connections. `connector_options` are passed to each TCPConnector, and hosts in `resolve` skip DNS altogether.
+
+    Services with a HedgePolicy in `hedges` have slow GETs hedged: a second attempt is sent and whichever answers first
+    is used, while the other is cancelled. Hedges are only sent while the service's breaker is closed.
+    """
+
+    def __init__(self, app, breakers=(), connector_options: dict = None, resolve: dict = None, hedges: dict = None):
+        self.requests = 0
+        self.coalesced = 0
+        self.breakers = {breaker.service: breaker for breaker in breakers}
+        self.hedges = hedges or {}
+        self.pools = {service: ConnectionPoolStats() for service in self.breakers}
+        self.sessions = {}
+        self._resolvers = []
+        self.connector_options = connector_options or {}
+        self.resolve = resolve or {}
+        self._app = app
+        self._in_flight = {}
+
+    def breaker_for(self, url: str):
+        matches = [breaker for breaker in self.breakers.values() if url.startswith(breaker.url)]
+        return max(matches, key=lambda breaker: len(breaker.url)) if matches else None
+
+    def service_for(self, url: str) -> str:
+        breaker = self.breaker_for(url)
+        return breaker.service if breaker is not None else 'other'
+
+    def session_for(self, url: str) -> ClientSession:
+        """The service's own session, or the app's shared session for anything else"""
+        breaker = self.breaker_for(url)
+        if breaker is None or breaker.service not in self.sessions:
+            return self._app.http_session_pool
+        return self.sessions[breaker.service]
+
+    async def get(self, url: str, auth: BasicAuth = None, deadline=None) -> ClientResponse:
+        if deadline is not None:
+            deadline.check()
+        key = (url, auth)
+        task = self._in_flight.get(key)
+        if task is None:
+            breaker = self.breaker_for(url)
+            if breaker is not None:
+                breaker.before_request()
+            self.requests += 1
+            task = self._in_flight[key] = asyncio.ensure_future(self._fetch(url, auth, breaker))
+            task.add_done_callback(partial(self._done, key))
+        else:
+            self.coalesced += 1
+            logger.debug("Coalescing with in-flight request", url=url)
+        if deadline is not None:
+            return await deadline.wait(asyncio.shield(task))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url, auth, breaker):
+        hedge = self.hedges.get(self.service_for(url))
+        if hedge is None:
+            return await self._attempt(url, auth, breaker)
+
+        hedge.request()
+        delay = hedge.delay
+        first = asyncio.ensure_future(self._attempt(url, auth, breaker, hedge))
+        attempts = [first]
+        try:
+            if delay is not None:
+                await asyncio.wait(attempts, timeout=delay)
+            if delay is None or first.done() or (breaker is not None and breaker.state != 'closed') or not hedge.allow():
+                return await first
+
+            logger.debug("Hedging slow request", url=url, delay=delay)
+            attempts.append(asyncio.ensure_future(self._attempt(url, auth, breaker, hedge)))
+            pending = attempts
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not first:
+                            hedge.wins += 1
+                        return attempt.result()
+            return await first  # neither attempt succeeded, so raise the first one's error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _attempt(self, url, auth, breaker, hedge=None):
+        start = time.perf_counter()
+        try:
+            async with self.session_for(url).get(url, auth=auth) as response:
+                await response.read()
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            self._app.metrics.observe_upstream(self.service_for(url), 'GET', 'error', time.perf_counter() - start)
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+
+        elapsed = time.perf_counter() - start
+        self._app.metrics.observe_upstream(self.service_for(url), 'GET', response.status, elapsed)
+
+        if breaker is not None:
+            if response.status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        if hedge is not None and response.status < 500:
+            hedge.observe(elapsed)
+        return response
+
+    def _done(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller has gone away
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+    async def start(self, app):
+        for service, pool in self.pools.items():
+            resolver = AsyncResolver()
+            self._resolvers.append(resolver)
+            if self.resolve:
+                resolver = StaticResolver(self.resolve, resolver)
+            connector = TCPConnector(resolver=resolver, **self.connector_options)
+            self.sessions[service] = ClientSession(connector=connector, timeout=ClientTimeout(total=30),
+                                                   trace_configs=[pool.trace_config()])
+
+    async def stop(self, app):
+        for session in self.sessions.values():
+            await session.close()
+        for resolver in self._resolvers:
+            await resolver.close()
+        self.sessions = {}
+        self._resolvers = []
@@ -0,0 +1,64 @@
+import logging
+import math
+import time
+
+from structlog import wrap_logger
+
+from .exceptions import REDIS_ERRORS
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+# Hands out launch slots one `interval` apart, in the order launches arrive, and returns the slot given to this one
+SCHEDULE_SCRIPT = """
+local slot = math.max(tonumber(ARGV[1]), tonumber(redis.call('GET', KEYS[1]) or '0') + tonumber(ARGV[2]))
+redis.call('SET', KEYS[1], tostring(slot), 'EX', ARGV[3])
+return tostring(slot)
+"""
+
+
+class WaitingRoom:
+    """
+    Queues launches so that no more than `rate` a second are let through to the RM services, across every worker.
+
+    Each launch is given a slot from a schedule kept in redis, one 1/`rate` seconds after the previous launch's, so
+    launches are admitted first come, first served. A launch whose slot is less than a second away goes straight
+    through; the rest wait in the waiting room until their slot comes round. Scheduling fails open if redis is
+    unavailable. A `rate` of 0 disables the waiting room.
+    """
+
+    key = 'respondent-home-ui:waiting-room:next-slot'
+
+    def __init__(self, app, rate: float, refresh: int, timer=time.time):
+        self.rate = rate
+        self.refresh = refresh
+        self.queued = 0
+        self._app = app
+        self._timer = timer
+
+    async def ticket(self):
+        """The slot the launch must wait for, or None if it can go ahead now"""
+        if not self.rate:
+            return None
+        now = self._timer()
+        try:
+            slot = float(await self._app.redis_connection.eval(
+                SCHEDULE_SCRIPT, keys=[self.key], args=[repr(now), repr(1 / self.rate), 3600]))
+        except REDIS_ERRORS as e:
+            logger.error('Failed to schedule launch in waiting room', message=str(e))
+            return None
+        if slot - now <= 1:
+            return None
+        self.queued += 1
+        return slot
+
+    def wait(self, slot: float) -> float:
+        """Seconds until the launch with `slot` is admitted"""
+        return max(slot - 1 - self._timer(), 0.0)
+
+    def position(self, slot: float) -> int:
+        """Roughly how many launches are ahead of the launch with `slot`"""
+        return math.ceil(self.wait(slot) * self.rate)
+
+    def refresh_after(self, slot: float) -> int:
+        return max(min(math.ceil(self.wait(slot)), self.refresh), 1)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+
+from structlog import wrap_logger
+
+from .eq import REFERENCE_DOCUMENTS, reference_request
+from .exceptions import REDIS_ERRORS
+
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+class CacheWarmer:
+    """
+    Prefetches reference data at startup, so the first launches on a new worker don't each pay for a cold cache.
+
+    The collection instrument and exercise documents are fetched concurrently for the collection exercises listed in
+    `collection_exercises`. If none are listed, every reference document already in redis is loaded instead. Warm-up
+    runs in the background, and `done` is set once it finishes or `timeout` seconds have passed.
+    """
+
+    def __init__(self, app, collection_exercises: list, timeout: float):
+        self.collection_exercises = collection_exercises
+        self.timeout = timeout
+        self.done = False
+        self.documents = 0
+        self._app = app
+        self._task = None
+
+    async def discover(self) -> list:
+        """Keys of the reference documents held in redis"""
+        cache = self._app.reference_cache
+        if not cache.redis_ttl:
+            return []
+        keys = []
+        try:
+            async for redis_key in self._app.redis_connection.iscan(match=f'{cache.key_prefix}:*'):
+                key = tuple(redis_key.decode()[len(cache.key_prefix) + 1:].split(':', 1))
+                if key[0] in REFERENCE_DOCUMENTS:
+                    keys.append(key)
+        except REDIS_ERRORS as e:
+            logger.error('Failed to discover reference data in redis', message=str(e))
+        return keys
+
+    async def _fetch(self, key: tuple):
+        cache = self._app.reference_cache
+        if await cache.get(key) is not None:
+            return
+        method, url, auth, func = reference_request(self._app, *key)
+        response = await self._app.upstream.get(url, auth=auth)
+        func(response)
+        await cache.set(key, await response.json())
+
+    async def warm(self):
+        if self.collection_exercises:
+            keys = [(kind, collex_id) for collex_id in self.collection_exercises
+                    for kind in ('collection_exercise', 'collection_exercise_events')]
+        else:
+            keys = await self.discover()
+
+        results = await asyncio.gather(*[self._fetch(key) for key in keys], return_exceptions=True)
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                logger.warn('Failed to warm reference data', key=':'.join(key), message=str(result))
+        self.documents = sum(1 for result in results if result is None)
+        logger.info('Reference data cache warmed', documents=self.documents, failed=len(keys) - self.documents)
+
+    async def _run(self):
+        try:
+            await asyncio.wait_for(self.warm(), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warn('Timed out warming reference data cache', timeout=self.timeout)
+        finally:
+            self.done = True
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "done": self.done,
+            "documents": self.documents,
+        }
+
+    async def start(self, app):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self, app):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
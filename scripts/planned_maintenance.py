@@ -36,11 +36,13 @@ def main(message, ttl=None):
         print(f'Message set: """{message_dict["text"]}""" TTL: {ttl}s')
     else:
         print(f'Message set: """{message_dict["text"]}"""')
+    redis_connection.publish(config_info.REDIS_MAINTENANCE_CHANNEL, 'set')
     print(f'Remove with: pipenv run python {__file__} --remove')
 
 
 def remove_message():
     redis_connection.delete(config_info.REDIS_MAINTENANCE_KEY)
+    redis_connection.publish(config_info.REDIS_MAINTENANCE_CHANNEL, 'removed')
     print('Removed')
 
 
@@ -32,7 +32,7 @@ def server(_, port=None, reload=True, debug=False, production=True):
         os.environ['APP_SETTINGS'] = 'ProductionConfig'
 
     command = (
-        'gunicorn "app.app:create_app()" -w 4 '
+        'gunicorn "app.app:create_app()" -c python:app.gunicorn_config -w 4 '
         f"--bind 0.0.0.0:{port} --worker-class aiohttp.worker.GunicornWebWorker "
         f"--access-logfile - --log-level {log_level}"
     )
@@ -126,6 +126,26 @@ def load(_, web=False):
                     f"--host={respondent_home_url}")
 
 
+@task
+def benchmark(_, launches=500, concurrency=50):
+    """Compare launch throughput per worker for each token executor"""
+    run_command(f"python -m tests.benchmark.token_encryption --launches {launches} --concurrency {concurrency}",
+                echo=True)
+
+
+@task
+def benchmark_probes(_, probes=2000, concurrency=20, cookie=False):
+    """Compare /info probe throughput per worker with and without the session middleware"""
+    run_command(f"python -m tests.benchmark.probes --probes {probes} --concurrency {concurrency}"
+                f"{' --cookie' if cookie else ''}", echo=True)
+
+
+@task
+def compile_templates(_, directory='.template-cache'):
+    """Fill the jinja2 bytecode cache used with TEMPLATE_BYTECODE_CACHE_DIR"""
+    run_command(f"python -m app.template_cache {directory}", echo=True)
+
+
 @task
 def create_sample(_, rows=1):
     from tests import generate_social_sample
@@ -0,0 +1,79 @@
+"""
+Health probe throughput of a single worker, with and without the session middleware on /info.
+
+`--probes` requests are made to `--path` with `--concurrency` in flight at once, first with every route going through
+the session, flash and maintenance middleware, then with the routes declared `use_session=False` skipping them.
+With `--cookie` each probe sends a session cookie holding a flashed message, as a browser would.
+
+    pipenv run inv benchmark-probes
+    pipenv run python -m tests.benchmark.probes --probes 5000 --path /info
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import time
+
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+from cryptography import fernet
+
+from app import MAINTENANCE_MSG
+from app.app import create_app
+
+
+def session_cookie(secret_key):
+    session = {'created': int(time.time()), 'session': {'flash': [MAINTENANCE_MSG]}}
+    token = fernet.Fernet(base64.urlsafe_b64encode(secret_key)).encrypt(json.dumps(session).encode())
+    return {'AIOHTTP_SESSION': token.decode()}
+
+
+async def run(sessionless, path, probes, concurrency, cookie):
+    app = create_app('TestingConfig')
+    if not sessionless:
+        app.sessionless_routes.clear()
+    cookies = session_cookie(app['SECRET_KEY']) if cookie else None
+
+    server = TestServer(app)
+    await server.start_server()
+    semaphore = asyncio.Semaphore(concurrency)
+    url = str(server.make_url(path))
+
+    async with ClientSession(cookies=cookies) as session:
+        async def probe():
+            async with semaphore:
+                async with session.get(url) as resp:
+                    await resp.read()
+
+        await probe()  # open a connection and render once before timing
+
+        start = time.perf_counter()
+        await asyncio.gather(*[probe() for _ in range(probes)])
+        elapsed = time.perf_counter() - start
+
+    await server.close()
+    return probes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--probes', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--path', default='/info')
+    parser.add_argument('--cookie', action='store_true', help='send a session cookie with each probe')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)  # every request is logged, which would dominate the timings
+
+    loop = asyncio.get_event_loop()
+    print(f"{args.probes} probes of {args.path}, {args.concurrency} concurrent"
+          f"{', with a session cookie' if args.cookie else ''}")
+    print(f"{'middleware':<14}{'probes/s':>10}")
+    for label, sessionless in (('all', False), ('sessionless', True)):
+        throughput = loop.run_until_complete(run(sessionless, args.path, args.probes, args.concurrency, args.cookie))
+        print(f"{label:<14}{throughput:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Launch throughput of a single worker with each token executor.
+
+Each simulated launch waits `--io` seconds for upstream services and then mints a token, with `--concurrency`
+launches in flight at once. Alongside the launches a probe measures how late the event loop wakes up from a short
+sleep, which is the delay every other request on the worker would see.
+
+    pipenv run inv benchmark
+    pipenv run python -m tests.benchmark.token_encryption --launches 1000 --executors inline process
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+
+from app.jwt import EXECUTORS, TokenEncrypter
+
+
+PROBE_INTERVAL = 0.005
+
+
+def launch_payload():
+    with open('tests/test_data/sample/sample_attributes.json') as fp:
+        attributes = json.load(fp)['attributes']
+    with open('tests/test_data/case/case.json') as fp:
+        case_json = json.load(fp)
+    return {
+        "jti": str(uuid.uuid4()),
+        "tx_id": str(uuid.uuid4()),
+        "user_id": case_json['sampleUnitId'],
+        "iat": int(time.time()),
+        "exp": int(time.time() + (5 * 60)),
+        "case_id": case_json['id'],
+        "case_ref": case_json['caseRef'],
+        "ru_ref": case_json['caseGroup']['sampleUnitRef'],
+        "language_code": 'en',
+        "display_address": f"{attributes['ADDRESS_LINE1']}, {attributes['TOWN_NAME']}",
+        "address_line1": attributes['ADDRESS_LINE1'],
+        "address_line2": attributes['ADDRESS_LINE2'],
+        "locality": attributes['LOCALITY'],
+        "town_name": attributes['TOWN_NAME'],
+        "postcode": attributes['POSTCODE'],
+        "country_code": attributes['COUNTRY'],
+    }
+
+
+async def probe_loop_lag(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def run(token_encrypter, payload, launches, concurrency, io):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def launch():
+        async with semaphore:
+            await asyncio.sleep(io)
+            await token_encrypter.encrypt(payload)
+
+    await token_encrypter.encrypt(payload)  # start the pool and load the keys before timing
+
+    lags, stop = [], asyncio.Event()
+    probe = asyncio.ensure_future(probe_loop_lag(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[launch() for _ in range(launches)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    await token_encrypter.stop(None)
+
+    return launches / elapsed, statistics.mean(lags), max(lags)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--launches', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--io', type=float, default=0.02, help='simulated upstream time per launch in seconds')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='executor pool size')
+    parser.add_argument('--executors', nargs='+', choices=EXECUTORS, default=EXECUTORS)
+    args = parser.parse_args()
+
+    with open('tests/test_data/test_keys.json') as fp:
+        keys = fp.read()
+    payload = launch_payload()
+
+    loop = asyncio.get_event_loop()
+    print(f"{args.launches} launches, {args.concurrency} concurrent, {args.io * 1000:.0f}ms upstream, "
+          f"{args.workers} pool workers")
+    print(f"{'executor':<10}{'launches/s':>12}{'mean lag ms':>14}{'max lag ms':>13}")
+    for executor in args.executors:
+        token_encrypter = TokenEncrypter(keys, executor=executor, max_workers=args.workers)
+        throughput, mean_lag, max_lag = loop.run_until_complete(
+            run(token_encrypter, payload, args.launches, args.concurrency, args.io))
+        print(f"{executor:<10}{throughput:>12.1f}{mean_lag * 1000:>14.2f}{max_lag * 1000:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import functools
 import json
 import time
 import uuid
+from unittest.mock import MagicMock
 
 from aiohttp.test_utils import AioHTTPTestCase
 
@@ -95,7 +96,7 @@ def build_eq_raises(func, *args, **kwargs):
 
 def skip_encrypt(func, *args, **kwargs):
     """
-    Helper decorator for manually patching the encrypt function in handlers.py.
+    Helper decorator for manually patching the encrypt function in jwt.py.
 
     This can be useful for tests that perform as a client but wish the server to skip encrypting a payload.
 
@@ -109,18 +110,18 @@ def skip_encrypt(func, *args, **kwargs):
     """
 
     async def _override_sdc_encrypt(*_):
-        from app import handlers
+        from app import jwt
 
         def encrypt(payload, **_):
             return json.dumps(payload)
 
-        handlers._bk_encrypt = handlers.encrypt
-        handlers.encrypt = encrypt
+        jwt._bk_encrypt = jwt.encrypt
+        jwt.encrypt = encrypt
 
     async def _reset_sdc_encrypt(*_):
-        from app import handlers
+        from app import jwt
 
-        handlers.encrypt = handlers._bk_encrypt
+        jwt.encrypt = jwt._bk_encrypt
 
     @functools.wraps(func, *args, **kwargs)
     def new_func(self, *inner_args, **inner_kwargs):
@@ -132,6 +133,16 @@ def skip_encrypt(func, *args, **kwargs):
     return new_func
 
 
+class AsyncMock(MagicMock):
+    """MagicMock that can be awaited, for mocking coroutine functions such as the aioredis commands."""
+
+    async def __call__(self, *args, **kwargs):
+        return super().__call__(*args, **kwargs)
+
+    def _get_child_mock(self, **kwargs):
+        return MagicMock(**kwargs)
+
+
 class RHTestCase(AioHTTPTestCase):
 
     language_code = 'en'
@@ -302,4 +313,4 @@ class RHTestCase(AioHTTPTestCase):
         class DummyConstructor:
             _collex_id = self.collection_exercise_id
             _collex_events = self.collection_exercise_events_json
-        self.dummy_eq = DummyConstructor()
\ No newline at end of file
+        self.dummy_eq = DummyConstructor()
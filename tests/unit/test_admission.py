@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import aioresponses
+
+from app.admission import AdmissionController
+from . import RHTestCase
+
+
+class TestAdmissionControl(RHTestCase):
+
+    async def shed_launch(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            with self.assertLogs('app.admission', 'WARNING') as cm:
+                response = await self.client.request("POST", self.post_index, data=self.form_data)
+            self.assertLogLine(cm, 'Shedding launch while overloaded')
+        self.assertEqual(len(mocked.requests), 0)
+        return response
+
+    @unittest_run_loop
+    async def test_shed_when_too_many_in_flight(self):
+        self.app.admission.max_in_flight = 0
+
+        response = await self.shed_launch()
+
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.headers['Retry-After'], '5')
+        self.assertIn("Sorry, we're very busy right now", await response.text())
+        self.assertEqual(self.app.admission.stats['shed'], 1)
+
+    @unittest_run_loop
+    async def test_shed_when_loop_lagging(self):
+        await self.app.admission.stop(self.app)
+        self.app.admission.loop_lag = 1.0
+
+        response = await self.shed_launch()
+
+        self.assertEqual(response.status, 503)
+
+    @unittest_run_loop
+    async def test_cheap_pages_served_when_overloaded(self):
+        self.app.admission.max_in_flight = 0
+
+        for url in ('/info', self.get_index, self.get_contact_us):
+            response = await self.client.request("GET", url)
+            self.assertEqual(response.status, 200)
+        self.assertEqual(self.app.admission.shed, 0)
+
+    @unittest_run_loop
+    async def test_loop_lag(self):
+        controller = AdmissionController(max_in_flight=10, max_loop_lag=0.05, retry_after=5, probe_interval=0.01)
+        await controller.start(self.app)
+        try:
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)  # block the loop
+            await asyncio.sleep(0.015)
+            self.assertTrue(controller.overloaded)
+        finally:
+            await controller.stop(self.app)
+
+        self.assertEqual(controller.in_flight, 0)
+        self.assertGreater(controller.loop_lag, 0.05)
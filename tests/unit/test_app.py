@@ -1,8 +1,10 @@
+import asyncio
 import json
 import os
 from importlib import reload
 from unittest import TestCase, mock
 
+from aiohttp.client_exceptions import ClientPayloadError
 from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
 from aiohttp.web_app import Application
 from aioresponses import aioresponses
@@ -43,6 +45,14 @@ class TestCreateApp(AioHTTPTestCase):
         self.assertEqual(response.headers['X-Content-Type-Options'], 'nosniff')
         self.assertEqual(response.headers['Referrer-Policy'], 'same-origin')
 
+    @unittest_run_loop
+    async def test_security_headers_not_modified(self):
+        response = await self.client.request("GET", "/")
+        response = await self.client.request("GET", "/", headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status, 304)
+        self.assertNotIn('Content-Security-Policy', response.headers)
+        self.assertEqual(response.headers['X-Content-Type-Options'], 'nosniff')
+
 
 class TestCreateAppURLPathPrefix(TestCase):
 
@@ -125,6 +135,67 @@ class TestCheckServices(AioHTTPTestCase):
         with aioresponses():
             self.assertFalse(await self.app.check_services())
 
+    @unittest_run_loop
+    async def test_check_services_reports_every_service(self):
+        case_url = self.app.service_status_urls['CASE_URL']
+        with aioresponses() as mocked:
+            for service_url in self.app.service_status_urls.values():
+                if service_url != case_url:
+                    mocked.get(service_url)
+            mocked.get(case_url, status=503)
+            self.assertFalse(await self.app.check_services())
+
+        results = self.app.service_health.results
+        self.assertCountEqual(results.keys(), self.app.service_status_urls.keys())
+        self.assertEqual(results['CASE_URL']['status'], 503)
+        self.assertFalse(results['CASE_URL']['healthy'])
+        self.assertTrue(results['IAC_URL']['healthy'])
+        self.assertIn('latency', results['IAC_URL'])
+
+    @unittest_run_loop
+    async def test_check_services_client_error(self):
+        case_url = self.app.service_status_urls['CASE_URL']
+        with aioresponses() as mocked:
+            for service_url in self.app.service_status_urls.values():
+                if service_url != case_url:
+                    mocked.get(service_url)
+            mocked.get(case_url, exception=ClientPayloadError('Response payload is not completed'))
+            self.assertFalse(await self.app.check_services())
+
+        results = self.app.service_health.results
+        self.assertIsNone(results['CASE_URL']['status'])
+        self.assertFalse(results['CASE_URL']['healthy'])
+        self.assertTrue(results['IAC_URL']['healthy'])
+
+    @unittest_run_loop
+    async def test_check_services_timeout(self):
+        self.app.service_health.timeout = 0.01
+
+        async def slow_service(url, **kwargs):
+            await asyncio.sleep(1)
+
+        with aioresponses() as mocked:
+            for service_url in self.app.service_status_urls.values():
+                mocked.get(service_url, callback=slow_service)
+            self.assertFalse(await asyncio.wait_for(self.app.check_services(), 0.5))
+
+        self.assertIsNone(self.app.service_health.results['CASE_URL']['status'])
+
+    @unittest_run_loop
+    async def test_check_services_cached(self):
+        with aioresponses() as mocked:
+            for service_url in self.app.service_status_urls.values():
+                mocked.get(service_url, repeat=True)
+            results = await asyncio.gather(self.app.check_services(), self.app.check_services())
+            self.assertTrue(await self.app.check_services())
+
+            self.assertEqual(results, [True, True])
+            self.assertEqual(sum(len(calls) for calls in mocked.requests.values()), len(self.required_services))
+
+            self.app.service_health.cache_ttl = 0
+            await self.app.check_services()
+            self.assertEqual(sum(len(calls) for calls in mocked.requests.values()), 2 * len(self.required_services))
+
 
 class TestCFEnv(TestCase):
 
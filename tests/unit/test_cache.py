@@ -0,0 +1,186 @@
+import json
+from unittest import TestCase
+
+from aiohttp.test_utils import unittest_run_loop
+
+from app.cache import ReferenceDataCache, TTLCache, UnknownIACCache
+from . import AsyncMock, RHTestCase
+
+
+class FakeTimer:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = TTLCache(maxsize=2, ttl=10, timer=self.timer)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.stats, {'hits': 0, 'misses': 1, 'size': 0, 'maxsize': 2})
+
+    def test_get(self):
+        self.cache.set('key', {'id': 1})
+        self.assertEqual(self.cache.get('key'), {'id': 1})
+        self.assertEqual(self.cache.stats, {'hits': 1, 'misses': 0, 'size': 1, 'maxsize': 2})
+
+    def test_get_expired(self):
+        self.cache.set('key', {'id': 1})
+        self.timer.now = 10
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_least_recently_used_evicted(self):
+        self.cache.set('first', 1)
+        self.cache.set('second', 2)
+        self.cache.get('first')
+        self.cache.set('third', 3)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('second'))
+        self.assertEqual(self.cache.get('first'), 1)
+        self.assertEqual(self.cache.get('third'), 3)
+
+    def test_disabled(self):
+        cache = TTLCache(maxsize=0, ttl=10)
+        cache.set('key', 1)
+        self.assertIsNone(cache.get('key'))
+
+    def test_clear(self):
+        self.cache.set('key', 1)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestReferenceDataCache(RHTestCase):
+
+    key = ('collection_exercise', '1234')
+    redis_key = 'respondent-home-ui:reference:collection_exercise:1234'
+
+    def setUp(self):
+        super().setUp()
+        self.cache = ReferenceDataCache(self.app, maxsize=10, ttl=10, redis_ttl=60)
+
+    @unittest_run_loop
+    async def test_get_from_redis(self):
+        self.app.redis_connection.get = AsyncMock(return_value=json.dumps(self.collection_exercise_json))
+
+        self.assertEqual(await self.cache.get(self.key), self.collection_exercise_json)
+        self.assertEqual(await self.cache.get(self.key), self.collection_exercise_json)
+
+        self.app.redis_connection.get.assert_called_once_with(self.redis_key)
+        self.assertEqual(self.cache.stats['redis_hits'], 1)
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+    @unittest_run_loop
+    async def test_get_missing(self):
+        self.app.redis_connection.get = AsyncMock(return_value=None)
+
+        self.assertIsNone(await self.cache.get(self.key))
+        self.assertEqual(self.cache.stats['redis_misses'], 1)
+        self.assertEqual(self.cache.stats['misses'], 1)
+
+    @unittest_run_loop
+    async def test_get_redis_unavailable(self):
+        self.app.redis_connection.get = AsyncMock(side_effect=ConnectionRefusedError)
+
+        with self.assertLogs('app.cache', 'ERROR') as cm:
+            self.assertIsNone(await self.cache.get(self.key))
+        self.assertLogLine(cm, 'Failed to read reference data from redis', key=self.redis_key)
+
+    @unittest_run_loop
+    async def test_get_unexpected_value(self):
+        self.app.redis_connection.get = AsyncMock(return_value=b'not json')
+
+        with self.assertLogs('app.cache', 'ERROR') as cm:
+            self.assertIsNone(await self.cache.get(self.key))
+        self.assertLogLine(cm, 'Unexpected reference data received from redis', key=self.redis_key)
+
+    @unittest_run_loop
+    async def test_set(self):
+        self.app.redis_connection.set = AsyncMock()
+
+        await self.cache.set(self.key, self.collection_exercise_json)
+
+        self.app.redis_connection.set.assert_called_once_with(
+            self.redis_key, json.dumps(self.collection_exercise_json), expire=60)
+        self.assertEqual(self.cache.local.get(self.key), self.collection_exercise_json)
+
+    @unittest_run_loop
+    async def test_set_redis_unavailable(self):
+        self.app.redis_connection.set = AsyncMock(side_effect=ConnectionRefusedError)
+
+        with self.assertLogs('app.cache', 'ERROR') as cm:
+            await self.cache.set(self.key, self.collection_exercise_json)
+        self.assertLogLine(cm, 'Failed to write reference data to redis', key=self.redis_key)
+        self.assertEqual(self.cache.local.get(self.key), self.collection_exercise_json)
+
+    @unittest_run_loop
+    async def test_redis_disabled(self):
+        cache = ReferenceDataCache(self.app, maxsize=10, ttl=10, redis_ttl=0)
+        self.app.redis_connection.get = AsyncMock()
+        self.app.redis_connection.set = AsyncMock()
+
+        await cache.set(self.key, self.collection_exercise_json)
+        cache.local.clear()
+        self.assertIsNone(await cache.get(self.key))
+
+        self.app.redis_connection.get.assert_not_called()
+        self.app.redis_connection.set.assert_not_called()
+
+
+class TestUnknownIACCache(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = UnknownIACCache(self.app, secret=b'secret', ttl=60)
+
+    def test_redis_key_is_hashed(self):
+        redis_key = self.cache.redis_key(self.iac_code)
+        self.assertTrue(redis_key.startswith('respondent-home-ui:unknown-iac:'))
+        self.assertNotIn(self.iac_code, redis_key)
+        self.assertEqual(redis_key, self.cache.redis_key(self.iac_code))
+        self.assertNotEqual(redis_key, UnknownIACCache(self.app, secret=b'other', ttl=60).redis_key(self.iac_code))
+
+    @unittest_run_loop
+    async def test_add(self):
+        self.app.redis_connection.set = AsyncMock()
+
+        await self.cache.add(self.iac_code)
+
+        self.app.redis_connection.set.assert_called_once_with(self.cache.redis_key(self.iac_code), '1', expire=60)
+
+    @unittest_run_loop
+    async def test_contains(self):
+        self.app.redis_connection.exists = AsyncMock(return_value=1)
+
+        self.assertTrue(await self.cache.contains(self.iac_code))
+        self.app.redis_connection.exists.assert_called_once_with(self.cache.redis_key(self.iac_code))
+
+    @unittest_run_loop
+    async def test_contains_redis_unavailable(self):
+        self.app.redis_connection.exists = AsyncMock(side_effect=ConnectionRefusedError)
+
+        with self.assertLogs('app.cache', 'ERROR') as cm:
+            self.assertFalse(await self.cache.contains(self.iac_code))
+        self.assertLogLine(cm, 'Failed to read unknown access code from redis')
+
+    @unittest_run_loop
+    async def test_disabled(self):
+        cache = UnknownIACCache(self.app, secret=b'secret', ttl=0)
+        self.app.redis_connection.exists = AsyncMock()
+        self.app.redis_connection.set = AsyncMock()
+
+        await cache.add(self.iac_code)
+        self.assertFalse(await cache.contains(self.iac_code))
+
+        self.app.redis_connection.exists.assert_not_called()
+        self.app.redis_connection.set.assert_not_called()
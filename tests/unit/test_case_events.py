@@ -0,0 +1,308 @@
+import asyncio
+from collections import OrderedDict
+
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import aioresponses
+
+from app.case_events import CaseEventDispatcher
+from app.deadline import Deadline
+from . import AsyncMock, RHTestCase
+
+
+class TestCaseEventDispatcher(RHTestCase):
+
+    description = 'Instrument LMS launched'
+
+    def setUp(self):
+        super().setUp()
+        self.dispatcher = self.create_dispatcher()
+
+    def create_dispatcher(self, **kwargs):
+        options = dict(maxsize=10, batch_size=5, max_retries=2, retry_backoff=0, flush_timeout=1)
+        options.update(kwargs)
+        return CaseEventDispatcher(self.app, **options)
+
+    async def tearDownAsync(self):
+        await self.dispatcher.stop(self.app)
+        await super().tearDownAsync()
+
+    @unittest_run_loop
+    async def test_enqueue(self):
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url)
+
+            await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            await self.dispatcher.flush()
+
+        self.assertEqual(len(mocked.requests), 1)
+
+    @unittest_run_loop
+    async def test_enqueue_batches(self):
+        await self.dispatcher.start(self.app)
+        case_ids = [f'case-{n}' for n in range(12)]
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            for case_id in case_ids:
+                mocked.post(f"{self.app['CASE_URL']}/cases/{case_id}/events")
+
+            for case_id in case_ids:
+                await self.dispatcher.enqueue(case_id, 'EQ_LAUNCH', self.description)
+            await self.dispatcher.flush()
+
+        self.assertEqual(len(mocked.requests), len(case_ids))
+
+    @unittest_run_loop
+    async def test_retry(self):
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url, status=503)
+            mocked.post(self.case_events_url)
+
+            await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            await self.dispatcher.flush()
+
+        self.assertEqual(len(mocked.requests), 1)  # requests are keyed by method and url
+        self.assertEqual(len(next(iter(mocked.requests.values()))), 2)
+
+    @unittest_run_loop
+    async def test_retries_exhausted(self):
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url, status=500, repeat=True)
+
+            await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            with self.assertLogs('app.case_events', 'ERROR') as cm:
+                await self.dispatcher.flush()
+
+        self.assertLogLine(cm, 'Failed to post case event', case_id=self.case_id, category='EQ_LAUNCH', attempts=3)
+
+    @unittest_run_loop
+    async def test_queue_full_posts_inline(self):
+        self.dispatcher = self.create_dispatcher(maxsize=1)
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url, repeat=True)
+
+            await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            with self.assertLogs('app.case_events', 'WARNING') as cm:
+                await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            self.assertLogLine(cm, 'Case event queue full, posting inline', case_id=self.case_id)
+            await self.dispatcher.flush()
+
+        self.assertEqual(len(next(iter(mocked.requests.values()))), 2)
+
+    @unittest_run_loop
+    async def test_inline_post_deadline_exceeded(self):
+        async def slow_post(url, **kwargs):
+            await asyncio.sleep(1)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url, callback=slow_post)
+
+            with self.assertLogs('app.case_events', 'ERROR') as cm:
+                await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description, deadline=Deadline(0.05))
+
+        self.assertLogLine(cm, 'Failed to post case event', case_id=self.case_id, attempts=1)
+
+    @unittest_run_loop
+    async def test_stop_flushes(self):
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url)
+
+            await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            await self.dispatcher.stop(self.app)
+
+        self.assertEqual(len(mocked.requests), 1)
+
+    def mock_stream(self, entries=(), pending=(), trimmed=()):
+        fields = OrderedDict([(b'case_id', self.case_id.encode()),
+                              (b'category', b'EQ_LAUNCH'),
+                              (b'description', self.description.encode())])
+        unread = [('case-events', entry_id, fields) for entry_id in entries]
+
+        async def xread_group(*args, count=None, **kwargs):
+            read = unread[:count]
+            del unread[:count]
+            return read
+
+        def execute(command, *args):
+            if command != b'XCLAIM':
+                raise ConnectionRefusedError
+            return ([[entry_id, [value for item in fields.items() for value in item]] for entry_id in pending]
+                    + [[entry_id, None] for entry_id in trimmed])
+
+        def xadd(stream, event, **kwargs):
+            unread.append((stream, b'1-0', fields))
+            return b'1-0'
+
+        redis = self.app.redis_connection
+        redis.xgroup_create = AsyncMock(return_value=True)
+        redis.xread_group = xread_group
+        redis.xpending = AsyncMock(return_value=[[entry_id, b'other-worker', 120000, 1]
+                                                 for entry_id in list(pending) + list(trimmed)])
+        redis.execute = AsyncMock(side_effect=execute)
+        redis.xadd = AsyncMock(side_effect=xadd)
+        redis.xack = AsyncMock(return_value=1)
+        redis.xdel = AsyncMock(return_value=1)
+        return redis
+
+    @unittest_run_loop
+    async def test_stream(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events')
+        redis = self.mock_stream()
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url)
+
+            await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            await self.dispatcher.flush()
+
+        self.assertEqual(len(mocked.requests), 1)
+        redis.xgroup_create.assert_called_once_with('case-events', 'respondent-home-ui', latest_id='0', mkstream=True)
+        redis.xadd.assert_called_once_with(
+            'case-events', {'case_id': self.case_id, 'category': 'EQ_LAUNCH', 'description': self.description},
+            max_len=10000)
+        redis.xack.assert_called_once_with('case-events', 'respondent-home-ui', b'1-0')
+        redis.xdel.assert_called_once_with('case-events', b'1-0')
+
+    @unittest_run_loop
+    async def test_stream_dead_letter(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events')
+        redis = self.mock_stream(entries=[b'1-0'])
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url, status=500, repeat=True)
+
+            with self.assertLogs('app.case_events', 'ERROR') as cm:
+                await self.dispatcher.flush()
+
+        self.assertLogLine(cm, 'Failed to post case event', case_id=self.case_id, attempts=3)
+        redis.xadd.assert_called_once_with(
+            'case-events:dead-letter',
+            {'case_id': self.case_id, 'category': 'EQ_LAUNCH', 'description': self.description}, max_len=10000)
+        redis.xack.assert_called_once_with('case-events', 'respondent-home-ui', b'1-0')
+        redis.xdel.assert_called_once_with('case-events', b'1-0')
+
+    @unittest_run_loop
+    async def test_stream_unavailable(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events')
+        redis = self.mock_stream()
+        redis.xadd = AsyncMock(side_effect=ConnectionRefusedError)
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url)
+
+            with self.assertLogs('app.case_events', 'WARNING') as cm:
+                await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            await self.dispatcher.flush()
+
+        self.assertLogLine(cm, 'Failed to persist case event to redis', case_id=self.case_id)
+        self.assertEqual(len(mocked.requests), 1)
+        redis.xack.assert_not_called()
+
+    @unittest_run_loop
+    async def test_stream_recovery(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events')
+        redis = self.mock_stream(pending=[b'1-0'])
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url)
+
+            with self.assertLogs('app.case_events', 'INFO') as cm:
+                await self.dispatcher.start(self.app)
+                await asyncio.sleep(0.01)
+            await self.dispatcher.flush()
+
+        self.assertLogLine(cm, 'Recovered case events from redis', count=1)
+        self.assertEqual(len(mocked.requests), 1)
+        redis.execute.assert_any_call(b'XCLAIM', 'case-events', 'respondent-home-ui', self.dispatcher.consumer, 60000,
+                                      b'1-0')
+        redis.xack.assert_called_once_with('case-events', 'respondent-home-ui', b'1-0')
+
+    @unittest_run_loop
+    async def test_stream_recovery_skips_in_flight(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events')
+        redis = self.mock_stream(pending=[b'1-0'])
+        self.dispatcher._in_flight.add(b'1-0')
+
+        await self.dispatcher._reclaim()
+
+        redis.execute.assert_not_called()
+
+    @unittest_run_loop
+    async def test_stream_recovery_trimmed(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events')
+        redis = self.mock_stream(pending=[b'1-0'], trimmed=[b'2-0'])
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url)
+
+            with self.assertLogs('app.case_events', 'ERROR') as cm:
+                await self.dispatcher._reclaim()
+            await self.dispatcher.flush()
+
+        self.assertLogLine(cm, 'Case events trimmed from redis before they were posted', count=1)
+        self.assertEqual(len(mocked.requests), 1)
+        redis.xack.assert_any_call('case-events', 'respondent-home-ui', b'2-0')
+        redis.xack.assert_any_call('case-events', 'respondent-home-ui', b'1-0')
+
+    @unittest_run_loop
+    async def test_stream_flush_drains(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events')
+        redis = self.mock_stream(entries=[f'{n}-0'.encode() for n in range(12)])
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url, repeat=True)
+
+            await self.dispatcher.stop(self.app)
+
+        self.assertEqual(len(next(iter(mocked.requests.values()))), 12)
+        self.assertEqual(redis.xdel.call_count, 12)
+
+    @unittest_run_loop
+    async def test_stream_consumer_survives_unexpected_error(self):
+        self.dispatcher = self.create_dispatcher(stream='case-events', poll_interval=0.01)
+        redis = self.mock_stream(entries=[b'1-0'])
+        xread_group = redis.xread_group
+        redis.xread_group = AsyncMock(side_effect=RuntimeError('unexpected'))
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url)
+
+            with self.assertLogs('app.case_events', 'ERROR') as cm:
+                await self.dispatcher.start(self.app)
+                await asyncio.sleep(0.05)
+            redis.xread_group = xread_group
+            await asyncio.sleep(0.05)
+            await self.dispatcher.flush()
+
+        self.assertLogLine(cm, 'Unexpected error reading case events')
+        self.assertFalse(self.dispatcher._consumer.done())
+        self.assertEqual(len(mocked.requests), 1)
+
+    @unittest_run_loop
+    async def test_flush_timeout(self):
+        self.dispatcher = self.create_dispatcher(max_retries=1, retry_backoff=10, flush_timeout=0.1)
+        await self.dispatcher.start(self.app)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.post(self.case_events_url, status=500)
+
+            await self.dispatcher.enqueue(self.case_id, 'EQ_LAUNCH', self.description)
+            with self.assertLogs('app.case_events', 'ERROR') as cm:
+                await self.dispatcher.flush(timeout=0.1)
+
+        self.assertLogLine(cm, 'Timed out flushing case events', outstanding=0)
+        self.assertFalse(self.dispatcher._worker.done())
@@ -0,0 +1,114 @@
+from unittest import TestCase
+
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import aioresponses
+from yarl import URL
+
+from app.circuit_breaker import CircuitBreaker
+from app.exceptions import CircuitOpenError
+from . import RHTestCase
+from .test_cache import FakeTimer
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.breaker = CircuitBreaker('case', 'http://localhost:8171', failure_threshold=2, reset_timeout=10,
+                                      timer=self.timer)
+
+    def trip(self):
+        for _ in range(self.breaker.failure_threshold):
+            self.breaker.before_request()
+            self.breaker.record_failure()
+
+    def test_closed(self):
+        self.breaker.before_request()
+        self.breaker.record_failure()
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_opens(self):
+        with self.assertLogs('app.circuit_breaker', 'ERROR') as cm:
+            self.trip()
+        self.assertIn('Circuit opened', cm.output[0])
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError) as ex:
+            self.breaker.before_request()
+        self.assertEqual(ex.exception.service, 'case')
+        self.assertEqual(self.breaker.stats, {'state': 'open', 'failures': 2, 'rejected': 1})
+
+    def test_half_open_allows_single_trial(self):
+        self.trip()
+        self.timer.now = 10
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.breaker.before_request()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+    def test_half_open_trial_success_closes(self):
+        self.trip()
+        self.timer.now = 10
+        self.breaker.before_request()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.before_request()
+
+    def test_half_open_trial_failure_reopens(self):
+        self.trip()
+        self.timer.now = 10
+        self.breaker.before_request()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.timer.now = 19
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+        self.timer.now = 20
+        self.assertEqual(self.breaker.state, 'half-open')
+
+
+class TestUpstreamCircuitBreakers(RHTestCase):
+
+    @unittest_run_loop
+    async def test_post_index_case_circuit_open(self):
+        breaker = self.app.upstream.breakers['case']
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, payload=self.iac_json, repeat=True)
+            mocked.get(self.case_url, status=500, repeat=True)
+
+            for _ in range(breaker.failure_threshold):
+                response = await self.client.request("POST", self.post_index, data=self.form_data)
+                self.assertEqual(response.status, 500)
+            self.assertEqual(breaker.state, 'open')
+
+            with self.assertLogs('respondent-home', 'WARNING') as cm:
+                response = await self.client.request("POST", self.post_index, data=self.form_data)
+            self.assertLogLine(cm, 'Service circuit open, failing fast', service_name='case')
+
+        self.assertEqual(response.status, 503)
+        self.assertIn('Sorry, something went wrong', str(await response.content.read()))
+        self.assertEqual(len(mocked.requests[('GET', URL(self.case_url))]), breaker.failure_threshold)
+
+    @unittest_run_loop
+    async def test_client_errors_do_not_open_circuit(self):
+        breaker = self.app.upstream.breakers['iac']
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, status=404, repeat=True)
+
+            for _ in range(breaker.failure_threshold):
+                await self.client.request("POST", self.post_index, data=self.form_data)
+
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_breaker_for(self):
+        self.assertEqual(self.app.upstream.breaker_for(self.case_url).service, 'case')
+        self.assertEqual(self.app.upstream.breaker_for(self.collection_exercise_url).service, 'collection_exercise')
+        self.assertIsNone(self.app.upstream.breaker_for('http://elsewhere/'))
@@ -0,0 +1,61 @@
+import asyncio
+from unittest import TestCase
+
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import CallbackResult, aioresponses
+
+from app.deadline import Deadline
+from app.exceptions import DeadlineExceededError
+from . import RHTestCase
+from .test_cache import FakeTimer
+
+
+class TestDeadline(TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.deadline = Deadline(15, timer=self.timer)
+
+    def test_remaining(self):
+        self.timer.now = 10
+        self.assertEqual(self.deadline.remaining, 5)
+        self.deadline.check()
+
+    def test_expired(self):
+        self.timer.now = 20
+        self.assertEqual(self.deadline.remaining, 0)
+        with self.assertRaises(DeadlineExceededError):
+            self.deadline.check()
+
+
+class TestLaunchDeadline(RHTestCase):
+
+    async def slow_case(self, url, **kwargs):
+        await asyncio.sleep(5)
+        return CallbackResult(payload=self.case_json)
+
+    @unittest_run_loop
+    async def test_wait(self):
+        deadline = Deadline(0.05)
+
+        self.assertEqual(await deadline.wait(asyncio.sleep(0, result='done')), 'done')
+        with self.assertRaises(DeadlineExceededError):
+            await deadline.wait(asyncio.sleep(1))
+
+    @unittest_run_loop
+    async def test_post_index_deadline_exceeded(self):
+        self.app['LAUNCH_DEADLINE'] = 0.1
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, payload=self.iac_json)
+            mocked.get(self.case_url, callback=self.slow_case)
+
+            with self.assertLogs('respondent-home', 'ERROR') as cm:
+                response = await asyncio.wait_for(
+                    self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data), 1)
+            self.assertLogLine(cm, "Request deadline exceeded waiting for services", deadline=0.1)
+
+        self.assertEqual(response.status, 504)
+        self.assertIn('Sorry, something went wrong', str(await response.content.read()))
+        self.assertEqual(self.app.metrics.registry.get_sample_value(
+            'respondent_home_launch_outcomes_total', {'outcome': 'timed_out'}), 1)
@@ -1,6 +1,8 @@
+import asyncio
 import functools
 from unittest import mock
 
+from aiohttp.client_exceptions import ClientConnectionError, ClientResponseError
 from aiohttp.test_utils import unittest_run_loop
 from aioresponses import aioresponses
 
@@ -102,6 +104,9 @@ class TestEq(RHTestCase):
 
         with aioresponses() as mocked:
             mocked.get(self.collection_instrument_url, payload=ci_json)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertRaises(InvalidEqPayLoad) as ex:
                 await eq.EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
@@ -114,6 +119,9 @@ class TestEq(RHTestCase):
 
         with aioresponses() as mocked:
             mocked.get(self.collection_instrument_url, payload=ci_json)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertRaises(InvalidEqPayLoad) as ex:
                 await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
@@ -126,6 +134,9 @@ class TestEq(RHTestCase):
 
         with aioresponses() as mocked:
             mocked.get(self.collection_instrument_url, payload=ci_json)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertRaises(InvalidEqPayLoad) as ex:
                 await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
@@ -138,6 +149,9 @@ class TestEq(RHTestCase):
 
         with aioresponses() as mocked:
             mocked.get(self.collection_instrument_url, payload=ci_json)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertRaises(InvalidEqPayLoad) as ex:
                 await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
@@ -150,6 +164,9 @@ class TestEq(RHTestCase):
 
         with aioresponses() as mocked:
             mocked.get(self.collection_instrument_url, payload=ci_json)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertRaises(InvalidEqPayLoad) as ex:
                 await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
@@ -163,6 +180,8 @@ class TestEq(RHTestCase):
         with aioresponses() as mocked:
             mocked.get(self.collection_instrument_url, payload=self.collection_instrument_json)
             mocked.get(self.collection_exercise_url, payload=ce_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertRaises(InvalidEqPayLoad) as ex:
                 await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
@@ -176,6 +195,8 @@ class TestEq(RHTestCase):
         with aioresponses() as mocked:
             mocked.get(self.collection_instrument_url, payload=self.collection_instrument_json)
             mocked.get(self.collection_exercise_url, payload=ce_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertRaises(InvalidEqPayLoad) as ex:
                 await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
@@ -213,6 +234,108 @@ class TestEq(RHTestCase):
                 await eq.EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
             self.assertIn(f'Could not retrieve attributes for case {self.case_id}', ex.exception.message)
 
+    @unittest_run_loop
+    async def test_build_fetches_concurrently(self):
+        in_flight = []
+        max_in_flight = []
+
+        def fetch(payload):
+            async def _fetch(_):
+                in_flight.append(payload)
+                max_in_flight.append(len(in_flight))
+                await asyncio.sleep(0.01)
+                in_flight.remove(payload)
+                return payload
+            return _fetch
+
+        with mock.patch.object(EqPayloadConstructor, '_get_collection_instrument',
+                               fetch(self.collection_instrument_json)), \
+                mock.patch.object(EqPayloadConstructor, '_get_collection_exercise',
+                                  fetch(self.collection_exercise_json)), \
+                mock.patch.object(EqPayloadConstructor, '_get_collection_exercise_events',
+                                  fetch(self.collection_exercise_events_json)), \
+                mock.patch.object(EqPayloadConstructor, '_get_sample_attributes_by_id',
+                                  fetch(self.sample_attributes_json)), \
+                mock.patch.object(EqPayloadConstructor, '_check_ce_has_ended'):
+            payload = await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
+
+        self.assertEqual(max(max_in_flight), 4)
+        self.assertEqual(payload['collection_exercise_sid'], self.collection_exercise_id)
+
+    @unittest_run_loop
+    async def test_build_failure_cancels_outstanding_requests(self):
+        cancelled = []
+
+        async def slow_fetch(_):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with mock.patch.object(EqPayloadConstructor, '_get_sample_attributes_by_id', slow_fetch):
+            with aioresponses() as mocked:
+                mocked.get(self.collection_instrument_url, status=500)
+                mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+                mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+
+                with self.assertRaises(ClientResponseError) as ex:
+                    await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
+
+        self.assertEqual(ex.exception.status, 500)
+        self.assertEqual(cancelled, [True])
+
+    @unittest_run_loop
+    async def test_build_closed_ce_takes_precedence_over_sample_failure(self):
+        async def slow_sample_failure(_):
+            await asyncio.sleep(0.01)
+            raise ClientConnectionError('Failed')
+
+        with mock.patch.object(EqPayloadConstructor, '_get_sample_attributes_by_id', slow_sample_failure), \
+                mock.patch.object(self.app.reference_cache, 'redis_ttl', 0):
+            with aioresponses() as mocked:
+                mocked.get(self.collection_instrument_url, payload=self.collection_instrument_json)
+                mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+                mocked.get(self.collection_exercise_events_url, payload=self.closed_ce_events_json)
+
+                with self.assertRaises(ExerciseClosedError):
+                    await EqPayloadConstructor(self.case_json, self.app, self.iac_code).build()
+
+    @unittest_run_loop
+    async def test_reference_data_cached(self):
+        eq_payload_constructor = EqPayloadConstructor(self.case_json, self.app, self.iac_code)
+
+        with aioresponses() as mocked:
+            mocked.get(self.collection_instrument_url, payload=self.collection_instrument_json)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+
+            for _ in range(2):  # NB: each url is only mocked once, so the second pass must come from the cache
+                self.assertEqual(await eq_payload_constructor._get_collection_instrument(),
+                                 self.collection_instrument_json)
+                self.assertEqual(await eq_payload_constructor._get_collection_exercise(),
+                                 self.collection_exercise_json)
+                self.assertEqual(await eq_payload_constructor._get_collection_exercise_events(),
+                                 self.collection_exercise_events_json)
+
+        self.assertEqual(self.app.reference_cache.local.hits, 3)
+        self.assertEqual(self.app.reference_cache.local.misses, 3)
+
+    @unittest_run_loop
+    async def test_reference_data_errors_not_cached(self):
+        eq_payload_constructor = EqPayloadConstructor(self.case_json, self.app, self.iac_code)
+
+        with aioresponses() as mocked:
+            mocked.get(self.collection_instrument_url, status=500)
+            mocked.get(self.collection_instrument_url, payload=self.collection_instrument_json)
+
+            with self.assertRaises(ClientResponseError):
+                await eq_payload_constructor._get_collection_instrument()
+            self.assertEqual(await eq_payload_constructor._get_collection_instrument(),
+                             self.collection_instrument_json)
+
+        self.assertEqual(len(self.app.reference_cache.local), 1)
+
     def test_find_event_date_by_tag(self):
         find_mandatory_date = functools.partial(EqPayloadConstructor._find_event_date_by_tag, mandatory=True)
 
@@ -1,15 +1,18 @@
+import asyncio
 import json
 from unittest import mock
 from urllib.parse import urlsplit, parse_qs
 
 from aiohttp.client_exceptions import ClientConnectionError, ClientConnectorError
-from aiohttp.test_utils import unittest_run_loop
+from aiohttp.test_utils import make_mocked_request, unittest_run_loop
 from aioresponses import aioresponses
+from yarl import URL
 
 from app import (
     BAD_CODE_MSG, BAD_CODE_TYPE_MSG, BAD_RESPONSE_MSG, INVALID_CODE_MSG, NOT_AUTHORIZED_MSG)
 from app.exceptions import InactiveIACError
-from app.handlers import Index
+from app.eq import EqPayloadConstructor
+from app.handlers import Index, LaunchContext
 
 from . import RHTestCase, build_eq_raises, skip_build_eq, skip_encrypt
 
@@ -51,9 +54,62 @@ class TestHandlers(RHTestCase):
                 response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
             self.assertLogLine(cm, 'Redirecting to eQ')
 
+            await self.app.case_events.flush()
+            [case_event_request] = mocked.requests[('POST', URL(self.case_events_url))]
+            self.assertEqual(case_event_request.kwargs['json']['category'], 'EQ_LAUNCH')
+
         self.assertEqual(response.status, 302)
         self.assertIn(self.app['EQ_URL'], response.headers['location'])
 
+    @skip_build_eq
+    @unittest_run_loop
+    async def test_post_index_server_timing(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, payload=self.iac_json)
+            mocked.get(self.case_url, payload=self.case_json)
+            mocked.post(self.case_events_url)
+
+            response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+            await self.app.case_events.flush()
+
+        self.assertEqual(response.status, 302)
+        stages = [metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')]
+        self.assertEqual(stages, ['iac', 'case', 'payload', 'encrypt', 'case_event', 'total'])
+
+    @unittest_run_loop
+    async def test_post_index_server_timing_error_page(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, payload=self.iac_json)
+            mocked.get(self.case_url, status=500)
+
+            response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+
+        self.assertEqual(response.status, 500)
+        self.assertRegex(response.headers['Server-Timing'], r'^iac;dur=[\d.]+, case;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @skip_build_eq
+    @unittest_run_loop
+    async def test_post_index_server_timing_disabled(self):
+        self.app['SERVER_TIMING'] = False
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, payload=self.iac_json)
+            mocked.get(self.case_url, payload=self.case_json)
+            mocked.post(self.case_events_url)
+
+            response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+            await self.app.case_events.flush()
+
+        self.assertEqual(response.status, 302)
+        self.assertNotIn('Server-Timing', response.headers)
+
+    @unittest_run_loop
+    async def test_get_index_no_server_timing(self):
+        response = await self.client.request("GET", self.get_index)
+
+        self.assertEqual(response.status, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+
     @unittest_run_loop
     async def test_post_index_connector_error(self):
         with aioresponses(passthrough=[str(self.server._root)]) as mocked:
@@ -123,6 +179,9 @@ class TestHandlers(RHTestCase):
             mocked.get(self.iac_url, payload=self.iac_json)
             mocked.get(self.case_url, payload=self.case_json)
             mocked.get(self.collection_instrument_url, exception=ClientConnectionError('Failed'))
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertLogs('respondent-home', 'ERROR') as cm:
                 response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
@@ -213,6 +272,9 @@ class TestHandlers(RHTestCase):
             mocked.post(self.case_events_url)
             # mocks for the payload builder
             mocked.get(self.collection_instrument_url, status=500)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertLogs('app.eq', 'ERROR') as cm:
                 response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
@@ -230,6 +292,9 @@ class TestHandlers(RHTestCase):
             mocked.post(self.case_events_url)
             # mocks for the payload builder
             mocked.get(self.collection_instrument_url, status=400)
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertLogs('app.eq', 'ERROR') as cm:
                 response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
@@ -248,6 +313,8 @@ class TestHandlers(RHTestCase):
             # mocks for the payload builder
             mocked.get(self.collection_instrument_url, payload=self.collection_instrument_json)
             mocked.get(self.collection_exercise_url, status=503)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertLogs('app.eq', 'ERROR') as cm:
                 response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
@@ -267,6 +334,7 @@ class TestHandlers(RHTestCase):
             mocked.get(self.collection_instrument_url, payload=self.collection_instrument_json)
             mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
             mocked.get(self.collection_exercise_events_url, status=404)
+            mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
 
             with self.assertLogs('app.eq', 'ERROR') as cm:
                 response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
@@ -307,14 +375,17 @@ class TestHandlers(RHTestCase):
             mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
             mocked.get(self.sample_attributes_url, payload=self.sample_attributes_json)
             mocked.get(self.survey_url, payload=self.survey_json)
-            mocked.post(self.case_events_url, status=500)
+            mocked.post(self.case_events_url, status=500, repeat=True)
 
-            with self.assertLogs('app.case', 'ERROR') as cm:
-                response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
-            self.assertLogLine(cm, "Error posting case event", status_code=500, case_id=self.case_id)
+            response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+            self.assertEqual(response.status, 302)
+            self.assertIn(self.app['EQ_URL'], response.headers['location'])
 
-        self.assertEqual(response.status, 500)
-        self.assertIn('Sorry, something went wrong', str(await response.content.read()))
+            with self.assertLogs('app.case', 'ERROR') as cm, self.assertLogs('app.case_events', 'ERROR') as cm_events:
+                await self.app.case_events.flush()
+            self.assertLogLine(cm, "Error posting case event", status_code=500, case_id=self.case_id)
+            self.assertLogLine(cm_events, "Failed to post case event", case_id=self.case_id, category='EQ_LAUNCH',
+                               attempts=self.app['CASE_EVENT_MAX_RETRIES'] + 1)
 
     @unittest_run_loop
     async def test_post_index_caseid_missing(self):
@@ -525,11 +596,36 @@ class TestHandlers(RHTestCase):
 
             with self.assertLogs('respondent-home', 'INFO') as cm:
                 response = await self.client.request("POST", self.post_index, data=self.form_data)
-            self.assertLogLine(cm, "Attempt to use an invalid access code", client_ip=None)
+            self.assertLogLine(cm, "Attempt to use an invalid access code", client_ip='127.0.0.1')
 
         self.assertEqual(response.status, 202)
         self.assertMessagePanel(INVALID_CODE_MSG, str(await response.content.read()))
 
+    @unittest_run_loop
+    async def test_post_index_iac_service_404_repeated(self):
+        unknown_iacs = set()
+
+        async def exists(key):
+            return int(key in unknown_iacs)
+
+        async def set_key(key, value, expire):
+            unknown_iacs.add(key)
+
+        self.app.unknown_iacs.ttl = 60
+        self.app.redis_connection.exists = exists
+        self.app.redis_connection.set = set_key
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, status=404)
+
+            first = await self.client.request("POST", self.post_index, data=self.form_data)
+            second = await self.client.request("POST", self.post_index, data=self.form_data)
+
+        self.assertEqual(len(mocked.requests[('GET', URL(self.iac_url))]), 1)
+        self.assertEqual(first.status, 202)
+        self.assertEqual(second.status, 202)
+        self.assertMessagePanel(INVALID_CODE_MSG, str(await second.content.read()))
+
     @unittest_run_loop
     async def test_post_index_iac_service_403(self):
         with aioresponses(passthrough=[str(self.server._root)]) as mocked:
@@ -537,7 +633,7 @@ class TestHandlers(RHTestCase):
 
             with self.assertLogs('respondent-home', 'INFO') as cm:
                 response = await self.client.request("POST", self.post_index, data=self.form_data)
-            self.assertLogLine(cm, "Unauthorized access to IAC service attempted", client_ip=None)
+            self.assertLogLine(cm, "Unauthorized access to IAC service attempted", client_ip='127.0.0.1')
 
         self.assertEqual(response.status, 200)
         self.assertMessagePanel(NOT_AUTHORIZED_MSG, str(await response.content.read()))
@@ -549,7 +645,7 @@ class TestHandlers(RHTestCase):
 
             with self.assertLogs('respondent-home', 'INFO') as cm:
                 response = await self.client.request("POST", self.post_index, data=self.form_data)
-            self.assertLogLine(cm, "Unauthorized access to IAC service attempted", client_ip=None)
+            self.assertLogLine(cm, "Unauthorized access to IAC service attempted", client_ip='127.0.0.1')
 
         self.assertEqual(response.status, 200)
         self.assertMessagePanel(NOT_AUTHORIZED_MSG, str(await response.content.read()))
@@ -561,11 +657,59 @@ class TestHandlers(RHTestCase):
 
             with self.assertLogs('respondent-home', 'INFO') as cm:
                 response = await self.client.request("POST", self.post_index, data=self.form_data)
-            self.assertLogLine(cm, "Client error when accessing IAC service", client_ip=None, status=400)
+            self.assertLogLine(cm, "Client error when accessing IAC service", client_ip='127.0.0.1', status=400)
 
         self.assertEqual(response.status, 200)
         self.assertMessagePanel(BAD_RESPONSE_MSG, str(await response.content.read()))
 
+    @skip_encrypt
+    @unittest_run_loop
+    async def test_post_index_concurrent_launches(self):
+        launches = 200
+
+        async def build(constructor):
+            await asyncio.sleep(0)  # yield so that the launches interleave
+            return {'case_id': constructor._case_id, 'iac': constructor._iac}
+
+        def launch(n):
+            iac = f'{n:012d}'
+            form_data = {'iac1': iac[:4], 'iac2': iac[4:8], 'iac3': iac[8:], 'action[save_continue]': ''}
+            headers = {'X-Forwarded-For': f'10.0.{n // 256}.{n % 256}'}
+            return self.client.request("POST", self.post_index, allow_redirects=False, data=form_data, headers=headers)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked, \
+                mock.patch.object(EqPayloadConstructor, 'build', build):
+            for n in range(launches):
+                case_id = f'case-{n}'
+                mocked.get(f"{self.app['IAC_URL']}/iacs/{n:012d}", payload={'active': True, 'caseId': case_id})
+                mocked.get(f"{self.app['CASE_URL']}/cases/{case_id}", payload=dict(self.case_json, id=case_id))
+                mocked.post(f"{self.app['CASE_URL']}/cases/{case_id}/events")
+
+            with self.assertLogs('respondent-home', 'INFO') as cm:
+                responses = await asyncio.gather(*[launch(n) for n in range(launches)])
+
+        for n, response in enumerate(responses):
+            self.assertEqual(response.status, 302)
+            _, _, _, query, *_ = urlsplit(response.headers['location'])
+            token = json.loads(parse_qs(query)['token'][0])
+            self.assertEqual(token, {'case_id': f'case-{n}', 'iac': f'{n:012d}'})
+
+        redirected_client_ips = [json.loads(record.message)['client_ip'] for record in cm.records
+                                 if json.loads(record.message)['event'] == 'Redirecting to eQ']
+        self.assertCountEqual(redirected_client_ips, [f'10.0.{n // 256}.{n % 256}' for n in range(launches)])
+
+    def test_launch_context_timings(self):
+        request = make_mocked_request('POST', '/', headers={'X-Forwarded-For': '127.0.0.1'}, app=self.app)
+        context = LaunchContext(request)
+
+        with context.stage('iac'):
+            pass
+
+        self.assertEqual(context.client_ip, '127.0.0.1')
+        self.assertEqual([name for name, _ in context.timings], ['iac'])
+        with self.assertRaises(AttributeError):
+            context.case_id = 'not a launch context field'
+
     def test_join_iac(self):
         # Given some post data
         post_data = {'iac1': '1234', 'iac2': '5678', 'iac3': '9012', 'action[save_continue]': ''}
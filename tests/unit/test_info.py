@@ -15,9 +15,24 @@ class TestInfo(AioHTTPTestCase):
         self.assertEqual(response.status, 200)
         self.assertIn('name', json)
         self.assertIn('version', json)
+        self.assertEqual(json['reference_cache'], {
+            'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 1000, 'redis_hits': 0, 'redis_misses': 0,
+        })
+        self.assertEqual(json['upstream'], {'requests': 0, 'coalesced': 0, 'in_flight': 0})
+        self.assertEqual(json['circuit_breakers']['case'], {'state': 'closed', 'failures': 0, 'rejected': 0})
+        self.assertCountEqual(json['circuit_breakers'].keys(),
+                              ['case', 'iac', 'sample', 'collection_exercise', 'collection_instrument'])
+        self.assertCountEqual(json['connection_pools'].keys(), json['circuit_breakers'].keys())
+        self.assertEqual(json['connection_pools']['case']['reuse_ratio'], 0.0)
+        self.assertEqual(json['hedging'], {})
+        self.assertEqual(json['admission']['shed'], 0)
+        self.assertEqual(json['waiting_room'], {'rate': 0.0, 'queued': 0})
+        self.assertEqual(json['page_cache'], {'hits': 0, 'misses': 0, 'size': 0})
 
     @unittest_run_loop
     async def test_get_info_check(self):
         response = await self.client.request("GET", "/info?check=true")
         self.assertEqual(response.status, 200)
-        self.assertIn('ready', await response.json())
+        json = await response.json()
+        self.assertIn('ready', json)
+        self.assertCountEqual(json['services'].keys(), self.app.service_status_urls.keys())
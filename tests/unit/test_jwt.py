@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from aiohttp.test_utils import unittest_run_loop
+
+from app.jwt import TokenEncrypter
+from . import RHTestCase
+
+
+class TestTokenEncrypter(RHTestCase):
+
+    async def encrypt(self, executor):
+        token_encrypter = TokenEncrypter(self.app['JSON_SECRET_KEYS'], executor=executor, max_workers=1)
+        try:
+            return await token_encrypter.encrypt(self.eq_payload)
+        finally:
+            await token_encrypter.stop(self.app)
+
+    def assertJWE(self, token):
+        self.assertIsInstance(token, str)
+        self.assertEqual(len(token.split('.')), 5)
+
+    @unittest_run_loop
+    async def test_encrypt_inline(self):
+        self.assertJWE(await self.encrypt('inline'))
+
+    @unittest_run_loop
+    async def test_encrypt_thread(self):
+        self.assertJWE(await self.encrypt('thread'))
+
+    @unittest_run_loop
+    async def test_encrypt_process(self):
+        self.assertJWE(await self.encrypt('process'))
+
+
+class TestTokenEncrypterConfig(TestCase):
+
+    def test_unknown_executor(self):
+        with open('./tests/test_data/test_keys.json') as fp:
+            keys = fp.read()
+        with self.assertRaises(ValueError):
+            TokenEncrypter(keys, executor='gpu')
+
+    def test_thread_executor_by_default(self):
+        with open('./tests/test_data/test_keys.json') as fp:
+            self.assertEqual(TokenEncrypter(fp.read()).executor, 'thread')
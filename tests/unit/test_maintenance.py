@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+from aiohttp.test_utils import unittest_run_loop
+
+from app import MAINTENANCE_MSG
+from app.maintenance import MaintenanceMonitor
+from . import AsyncMock, RHTestCase
+from .test_cache import FakeTimer
+
+
+class TestMaintenanceMonitor(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.message_dict = MAINTENANCE_MSG.copy()
+        self.message_dict['text'] = self.message_dict['text'].format(message='Test')
+        self.timer = FakeTimer()
+        self.monitor = MaintenanceMonitor(self.app, poll_interval=30, timer=self.timer)
+
+    @unittest_run_loop
+    async def test_refresh(self):
+        self.app.redis_connection.get = AsyncMock(return_value=json.dumps(self.message_dict))
+        self.app.redis_connection.ttl = AsyncMock(return_value=1)
+        with self.assertLogs('app.maintenance', 'INFO') as cm:
+            await self.monitor.refresh()
+        self.assertLogLine(cm, 'Maintenance message received from redis', message=self.message_dict['text'], ttl=1)
+        self.assertEqual(self.monitor.message, self.message_dict)
+
+    @unittest_run_loop
+    async def test_refresh_without_expiry(self):
+        self.app.redis_connection.get = AsyncMock(return_value=json.dumps(self.message_dict))
+        self.app.redis_connection.ttl = AsyncMock(return_value=-1)
+        await self.monitor.refresh()
+        self.timer.now = 10 ** 6
+        self.assertEqual(self.monitor.message, self.message_dict)
+
+    @unittest_run_loop
+    async def test_message_expires_locally(self):
+        self.app.redis_connection.get = AsyncMock(return_value=json.dumps(self.message_dict))
+        self.app.redis_connection.ttl = AsyncMock(return_value=10)
+        await self.monitor.refresh()
+        self.timer.now = 9
+        self.assertEqual(self.monitor.message, self.message_dict)
+        self.timer.now = 10
+        self.assertIsNone(self.monitor.message)
+
+    @unittest_run_loop
+    async def test_refresh_removed(self):
+        self.monitor.update(self.message_dict)
+        self.app.redis_connection.get = AsyncMock(return_value=None)
+        with self.assertLogs('app.maintenance', 'INFO') as cm:
+            await self.monitor.refresh()
+        self.assertLogLine(cm, 'Maintenance message removed')
+        self.assertIsNone(self.monitor.message)
+
+    @unittest_run_loop
+    async def test_refresh_failed_keeps_snapshot(self):
+        self.monitor.update(self.message_dict)
+        self.app.redis_connection.get = AsyncMock(side_effect=ConnectionRefusedError)
+        with self.assertLogs('app.maintenance', 'ERROR') as cm:
+            await self.monitor.refresh()
+        self.assertLogLine(cm, 'Failed to connect to redis')
+        self.assertEqual(self.monitor.message, self.message_dict)
+
+    @unittest_run_loop
+    async def test_refresh_unexpected_message(self):
+        self.app.redis_connection.get = AsyncMock(return_value=json.dumps([1, 2, 3]))
+        self.app.redis_connection.ttl = AsyncMock(return_value=1)
+        with self.assertLogs('app.maintenance', 'ERROR') as cm:
+            await self.monitor.refresh()
+        self.assertLogLine(cm, 'Unexpected message type received from redis')
+        self.assertIsNone(self.monitor.message)
+
+    @unittest_run_loop
+    async def test_refresh_malformed_message(self):
+        self.monitor.update(self.message_dict)
+        self.app.redis_connection.ttl = AsyncMock(return_value=1)
+        for malformed in ('not json', json.dumps({'level': 'info'})):
+            self.app.redis_connection.get = AsyncMock(return_value=malformed)
+            with self.assertLogs('app.maintenance', 'ERROR') as cm:
+                await self.monitor.refresh()
+            self.assertLogLine(cm, 'Unexpected message type received from redis')
+        self.assertEqual(self.monitor.message, self.message_dict)
+
+    @unittest_run_loop
+    async def test_watch_continues_after_unexpected_error(self):
+        self.monitor._stopping = asyncio.Event()
+
+        def listen():
+            if not listen.called:
+                listen.called = True
+                raise RuntimeError('unexpected')
+            self.monitor._stopping.set()
+            return 0
+
+        listen.called = False
+        self.monitor._listen = AsyncMock(side_effect=listen)
+
+        with self.assertLogs('app.maintenance', 'ERROR') as cm:
+            await self.monitor.watch()
+        self.assertLogLine(cm, 'Unexpected error watching for maintenance notifications')
+        self.assertEqual(self.monitor._listen.call_count, 2)
+
+    @unittest_run_loop
+    async def test_disabled(self):
+        self.monitor.poll_interval = 0
+        await self.monitor.start(self.app)
+        self.assertIsNone(self.monitor._task)
+        await self.monitor.stop(self.app)
+
+    @unittest_run_loop
+    async def test_stop(self):
+        await self.monitor.start(self.app)
+        await self.monitor.stop(self.app)
+        self.assertIsNone(self.monitor._task)
@@ -0,0 +1,98 @@
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from aiohttp.client_exceptions import ClientConnectorError
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import aioresponses
+
+from app.metrics import Metrics
+from . import RHTestCase
+
+
+class TestMetrics(RHTestCase):
+
+    def sample(self, name, **labels):
+        return self.app.metrics.registry.get_sample_value(name, labels) or 0
+
+    @unittest_run_loop
+    async def test_get_metrics(self):
+        await self.client.request("GET", "/info")
+
+        response = await self.client.request("GET", "/metrics")
+
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        body = await response.text()
+        self.assertIn('respondent_home_request_seconds_count{method="GET",route="/info",status="200"} 1.0', body)
+        self.assertIn('respondent_home_launch_outcomes_total{outcome="launched"} 0.0', body)
+
+    @unittest_run_loop
+    async def test_launch_outcome(self):
+        iac_json = self.iac_json.copy()
+        iac_json['active'] = False
+        case_json = self.case_json.copy()
+        case_json['caseGroup']['caseGroupStatus'] = 'OTHERNONRESPONSE'
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, payload=iac_json)
+            mocked.get(self.case_url, payload=case_json)
+
+            await self.client.request("POST", self.post_index, data=self.form_data)
+
+        self.assertEqual(self.sample('respondent_home_launch_outcomes_total', outcome='inactive'), 1)
+        self.assertEqual(self.sample('respondent_home_upstream_request_seconds_count',
+                                     service='iac', method='GET', status='200'), 1)
+        self.assertEqual(self.sample('respondent_home_upstream_request_seconds_count',
+                                     service='case', method='GET', status='200'), 1)
+
+    @unittest_run_loop
+    async def test_upstream_error(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, exception=ClientConnectorError(mock.MagicMock(), mock.MagicMock()))
+
+            response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+
+        self.assertEqual(response.status, 500)
+        self.assertEqual(self.sample('respondent_home_launch_outcomes_total', outcome='upstream_error'), 1)
+        self.assertEqual(self.sample('respondent_home_upstream_request_seconds_count',
+                                     service='iac', method='GET', status='error'), 1)
+        self.assertEqual(self.sample('respondent_home_request_seconds_count',
+                                     route=str(self.post_index), method='POST', status='500'), 1)
+
+
+class TestMultiprocessMetrics(RHTestCase):
+
+    def test_render_collects_every_worker(self):
+        with tempfile.TemporaryDirectory() as multiprocess_dir, \
+                mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': multiprocess_dir}), \
+                mock.patch('app.metrics.multiprocess.MultiProcessCollector') as collector:
+            response = Metrics().render()
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(collector.call_args[1], {'path': multiprocess_dir})
+
+    def test_gunicorn_config(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': os.path.join(tmp, 'metrics')}):
+            os.makedirs(os.path.join(tmp, 'metrics'))
+            open(os.path.join(tmp, 'metrics', 'counter_1.db'), 'w').close()
+            gunicorn_config = importlib.reload(importlib.import_module('app.gunicorn_config'))
+            self.assertEqual(os.listdir(os.path.join(tmp, 'metrics')), [])
+
+            with mock.patch('prometheus_client.multiprocess.mark_process_dead') as mark_process_dead:
+                gunicorn_config.child_exit(mock.MagicMock(), mock.MagicMock(pid=123))
+            mark_process_dead.assert_called_once_with(123)
+
+    def test_preload_with_missing_directory(self):
+        # NB: in a new interpreter, as prometheus_client picks its mode when first imported
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=os.path.join(tmp, 'missing', 'metrics'))
+            subprocess.run([sys.executable, '-c', 'import app.gunicorn_config\n'
+                                                  'from app.app import create_app\n'
+                                                  'create_app("TestingConfig")'],
+                           env=env, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+            self.assertTrue(os.listdir(os.path.join(tmp, 'missing', 'metrics')))
@@ -1,12 +1,12 @@
-import json
-from unittest.mock import MagicMock
+from unittest import mock
 
-import redis
 from aiohttp.test_utils import make_mocked_request, unittest_run_loop
+from aiohttp_session import get_session
+from aiohttp_session.cookie_storage import EncryptedCookieStorage
 
 from app import MAINTENANCE_MSG
 from app.flash import REQUEST_KEY, maintenance_middleware
-from . import RHTestCase
+from . import AsyncMock, RHTestCase
 
 
 async def dummy_handler(_):
@@ -24,49 +24,57 @@ class TestMaintenanceMiddleware(RHTestCase):
     async def test_get_maintenance_message(self):
         request = make_mocked_request('GET', '/', app=self.app)
         request[REQUEST_KEY] = []
-        request.app.redis_connection.get = MagicMock(return_value=json.dumps(self.message_dict))
-        request.app.redis_connection.ttl = MagicMock(return_value=1)
-        with self.assertLogs('app.flash', 'INFO') as cm:
-            await maintenance_middleware(request, dummy_handler)
-        self.assertLogLine(cm, 'Maintenance message received from redis', message=self.message_dict['text'], ttl=1)
+        self.app.maintenance.update(self.message_dict)
+        await maintenance_middleware(request, dummy_handler)
         self.assertIn(self.message_dict, request[REQUEST_KEY])
 
     @unittest_run_loop
     async def test_get_maintenance_message_first(self):
         request = make_mocked_request('GET', '/', app=self.app)
         request[REQUEST_KEY] = [123]
-        request.app.redis_connection.get = MagicMock(return_value=json.dumps(self.message_dict))
-        request.app.redis_connection.ttl = MagicMock(return_value=1)
-        with self.assertLogs('app.flash', 'INFO') as cm:
-            await maintenance_middleware(request, dummy_handler)
-        self.assertLogLine(cm, 'Maintenance message received from redis', message=self.message_dict['text'], ttl=1)
+        self.app.maintenance.update(self.message_dict)
+        await maintenance_middleware(request, dummy_handler)
         self.assertEqual(self.message_dict, request[REQUEST_KEY][0])
 
     @unittest_run_loop
     async def test_get_no_maintenance_message(self):
         request = make_mocked_request('GET', '/', app=self.app)
         request[REQUEST_KEY] = []
-        request.app.redis_connection.get = MagicMock(return_value=None)
+        self.app.maintenance.update(None)
         await maintenance_middleware(request, dummy_handler)
         self.assertNotIn(self.message_dict, request[REQUEST_KEY])
 
     @unittest_run_loop
-    async def test_get_maintenance_message_failed(self):
+    async def test_get_maintenance_message_does_not_call_redis(self):
         request = make_mocked_request('GET', '/', app=self.app)
         request[REQUEST_KEY] = []
-        request.app.redis_connection.get = MagicMock(side_effect=redis.exceptions.ConnectionError)
-        with self.assertLogs('app.flash', 'ERROR') as cm:
-            await maintenance_middleware(request, dummy_handler)
-        self.assertLogLine(cm, 'Failed to connect to redis')
-        self.assertNotIn(self.message_dict, request[REQUEST_KEY])
+        await self.app.maintenance.stop(self.app)
+        self.app.redis_connection.get = AsyncMock()
+        self.app.maintenance.update(self.message_dict)
+        await maintenance_middleware(request, dummy_handler)
+        self.app.redis_connection.get.assert_not_called()
+
+
+class TestSessionlessRoutes(RHTestCase):
+
+    def test_sessionless_routes(self):
+        self.assertEqual(self.app.sessionless_routes, {'Info:get', 'Metrics:get'})
 
     @unittest_run_loop
-    async def test_get_unexpected_maintenance_message(self):
-        request = make_mocked_request('GET', '/', app=self.app)
-        request[REQUEST_KEY] = []
-        request.app.redis_connection.get = MagicMock(return_value=[1, 2, 3])
-        request.app.redis_connection.ttl = MagicMock(return_value=1)
-        with self.assertLogs('app.flash', 'ERROR') as cm:
-            await maintenance_middleware(request, dummy_handler)
-        self.assertLogLine(cm, 'Unexpected message type received from redis')
-        self.assertNotIn(self.message_dict, request[REQUEST_KEY])
+    async def test_probe_skips_session(self):
+        self.app.maintenance.update(MAINTENANCE_MSG)
+        with mock.patch.object(EncryptedCookieStorage, 'load_session') as load_session, \
+                mock.patch('app.flash.get_session') as get_session:
+            for url in ('/info', '/metrics'):
+                response = await self.client.request("GET", url)
+                self.assertEqual(response.status, 200)
+                self.assertNotIn('Set-Cookie', response.headers)
+        load_session.assert_not_called()
+        get_session.assert_not_called()
+
+    @unittest_run_loop
+    async def test_pages_use_session(self):
+        with mock.patch('app.flash.get_session', wraps=get_session) as flash_get_session:
+            response = await self.client.request("GET", self.get_index)
+        self.assertEqual(response.status, 200)
+        flash_get_session.assert_called_once()
@@ -0,0 +1,116 @@
+import re
+
+from aiohttp.test_utils import unittest_run_loop
+
+from app import MAINTENANCE_MSG
+from app.page_cache import NONCE_PLACEHOLDER
+from . import RHTestCase
+
+
+class TestPageCache(RHTestCase):
+
+    async def get_nonces(self, url, status=200):
+        response = await self.client.request("GET", url)
+        self.assertEqual(response.status, status)
+        self.assertEqual(response.content_type, 'text/html')
+        body = await response.text()
+        self.assertNotIn(NONCE_PLACEHOLDER, body)
+        return set(re.findall(r'nonce="(\w+)"', body))
+
+    @unittest_run_loop
+    async def test_page_reused_with_new_nonce(self):
+        first = await self.get_nonces(self.get_contact_us)
+        second = await self.get_nonces(self.get_contact_us)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.app.page_cache.stats, {'hits': 1, 'misses': 1, 'size': 1})
+
+    @unittest_run_loop
+    async def test_error_page_cached(self):
+        await self.get_nonces('/not-a-page', status=404)
+        await self.get_nonces('/not-a-page', status=404)
+
+        self.assertEqual(self.app.page_cache.stats, {'hits': 1, 'misses': 1, 'size': 1})
+
+    @unittest_run_loop
+    async def test_flashed_messages_rendered_in_full(self):
+        message = dict(MAINTENANCE_MSG, text=MAINTENANCE_MSG['text'].format(message='Test'))
+        self.app.maintenance.update(message)
+
+        response = await self.client.request("GET", self.get_index)
+
+        self.assertEqual(response.status, 200)
+        self.assertIn('Test', await response.text())
+        self.assertEqual(self.app.page_cache.stats, {'hits': 0, 'misses': 0, 'size': 0})
+
+    @unittest_run_loop
+    async def test_flashed_messages_not_shown_page_cached(self):
+        self.app.maintenance.update(dict(MAINTENANCE_MSG, text=MAINTENANCE_MSG['text'].format(message='Test')))
+
+        await self.get_nonces(self.get_cookies_privacy)
+        await self.get_nonces(self.get_cookies_privacy)
+
+        self.assertEqual(self.app.page_cache.stats, {'hits': 1, 'misses': 1, 'size': 1})
+
+    @unittest_run_loop
+    async def test_disabled(self):
+        self.app.page_cache.enabled = False
+
+        await self.get_nonces(self.get_cookies_privacy)
+
+        self.assertEqual(self.app.page_cache.stats, {'hits': 0, 'misses': 0, 'size': 0})
+
+
+class TestConditionalGet(RHTestCase):
+
+    @unittest_run_loop
+    async def test_etag_and_cache_control(self):
+        first = await self.client.request("GET", self.get_contact_us)
+        second = await self.client.request("GET", self.get_contact_us)
+
+        self.assertEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertTrue(first.headers['ETag'].startswith('"'))
+        self.assertEqual(first.headers['Cache-Control'], 'private, max-age=3600')
+
+    @unittest_run_loop
+    async def test_not_modified(self):
+        response = await self.client.request("GET", self.get_cookies_privacy)
+        etag = response.headers['ETag']
+
+        response = await self.client.request("GET", self.get_cookies_privacy, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status, 304)
+        self.assertEqual(await response.read(), b'')
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.headers['Cache-Control'], 'private, max-age=3600')
+
+    @unittest_run_loop
+    async def test_not_modified_weak_etag(self):
+        response = await self.client.request("GET", self.get_index)
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+
+        response = await self.client.request("GET", self.get_index, headers={'If-None-Match': f'"other", W/{etag}'})
+
+        self.assertEqual(response.status, 304)
+
+    @unittest_run_loop
+    async def test_modified(self):
+        response = await self.client.request("GET", self.get_contact_us, headers={'If-None-Match': '"stale"'})
+
+        self.assertEqual(response.status, 200)
+        self.assertIn('ETag', response.headers)
+
+    @unittest_run_loop
+    async def test_no_etag_for_errors_or_flashed_messages(self):
+        response = await self.client.request("GET", '/not-a-page')
+        self.assertEqual(response.status, 404)
+        self.assertNotIn('ETag', response.headers)
+        self.assertNotIn('Cache-Control', response.headers)
+
+        self.app.maintenance.update(dict(MAINTENANCE_MSG, text=MAINTENANCE_MSG['text'].format(message='Test')))
+        response = await self.client.request("GET", self.get_index, headers={'If-None-Match': '*'})
+        self.assertEqual(response.status, 200)
+        self.assertNotIn('ETag', response.headers)
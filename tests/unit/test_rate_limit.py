@@ -0,0 +1,93 @@
+from unittest.mock import MagicMock
+
+from aiohttp.test_utils import make_mocked_request, unittest_run_loop
+from aioresponses import aioresponses
+
+from app import RATE_LIMITED_MSG
+from app.rate_limit import client_address
+from . import AsyncMock, RHTestCase
+
+
+class TestRateLimiter(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.limiter = self.app.rate_limiter
+        self.limiter.limit = 10
+
+    def mock_attempts(self, attempts):
+        transaction = MagicMock(execute=AsyncMock(return_value=[0, 1, attempts, 1]))
+        self.app.redis_connection.multi_exec = MagicMock(return_value=transaction)
+        return transaction
+
+    @unittest_run_loop
+    async def test_allow(self):
+        transaction = self.mock_attempts(10)
+
+        self.assertTrue(await self.limiter.allow('1.2.3.4'))
+        transaction.zadd.assert_called_once()
+        transaction.expire.assert_called_once_with('respondent-home-ui:rate-limit:1.2.3.4', 60)
+
+    @unittest_run_loop
+    async def test_over_limit(self):
+        self.mock_attempts(11)
+
+        self.assertFalse(await self.limiter.allow('1.2.3.4'))
+
+    @unittest_run_loop
+    async def test_disabled(self):
+        self.limiter.limit = 0
+        transaction = self.mock_attempts(11)
+
+        self.assertTrue(await self.limiter.allow('1.2.3.4'))
+        transaction.execute.assert_not_called()
+
+    @unittest_run_loop
+    async def test_redis_unavailable(self):
+        transaction = MagicMock(execute=AsyncMock(side_effect=ConnectionRefusedError))
+        self.app.redis_connection.multi_exec = MagicMock(return_value=transaction)
+
+        with self.assertLogs('app.rate_limit', 'ERROR') as cm:
+            self.assertTrue(await self.limiter.allow('1.2.3.4'))
+        self.assertLogLine(cm, 'Failed to check rate limit in redis')
+
+    @unittest_run_loop
+    async def test_post_index_rate_limited(self):
+        self.mock_attempts(11)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            with self.assertLogs('app.rate_limit', 'WARNING') as cm:
+                response = await self.client.request("POST", self.post_index, data=self.form_data,
+                                                     headers={'X-Forwarded-For': '1.2.3.4, 10.0.0.1'})
+            self.assertLogLine(cm, 'Client rate limited', client_ip='10.0.0.1')
+
+        self.assertEqual(len(mocked.requests), 0)
+        self.assertEqual(response.status, 429)
+        self.assertEqual(response.headers['Retry-After'], '60')
+        self.assertIn(RATE_LIMITED_MSG['text'], await response.text())
+
+    @unittest_run_loop
+    async def test_client_address_ignores_spoofed_entries(self):
+        transaction = self.mock_attempts(11)
+
+        for spoofed in ('1.2.3.4', '5.6.7.8'):
+            await self.client.request("POST", self.post_index, data=self.form_data,
+                                      headers={'X-Forwarded-For': f'{spoofed}, 10.0.0.1'})
+
+        self.assertEqual([call[0][0] for call in transaction.zadd.call_args_list],
+                         ['respondent-home-ui:rate-limit:10.0.0.1'] * 2)
+
+    def test_client_address_trusted_hops(self):
+        headers = {'X-Forwarded-For': '1.2.3.4, 10.0.0.1, 10.0.0.2'}
+        self.app['TRUSTED_PROXY_HOPS'] = 2
+        self.assertEqual(client_address(make_mocked_request('POST', '/', headers=headers, app=self.app)), '10.0.0.1')
+        self.app['TRUSTED_PROXY_HOPS'] = 5
+        self.assertEqual(client_address(make_mocked_request('POST', '/', headers=headers, app=self.app)), '1.2.3.4')
+
+    @unittest_run_loop
+    async def test_get_index_not_rate_limited(self):
+        self.mock_attempts(11)
+
+        response = await self.client.request("GET", self.get_index)
+
+        self.assertEqual(response.status, 200)
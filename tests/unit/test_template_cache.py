@@ -0,0 +1,41 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import jinja2
+
+from app.template_cache import environment_options, preload
+
+
+class TestTemplateCache(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def environment(self, **kwargs):
+        env = jinja2.Environment(**environment_options(self.cache_dir.name, **kwargs))
+        env.install_null_translations()
+        return env
+
+    def test_environment_options(self):
+        self.assertFalse(environment_options('', preload=True)['auto_reload'])
+        self.assertTrue(environment_options('', preload=False)['auto_reload'])
+        self.assertNotIn('bytecode_cache', environment_options('', preload=True))
+
+    def test_preload(self):
+        env = self.environment(preload=True)
+        with self.assertLogs('app.template_cache', 'INFO'):
+            count = preload(env)
+
+        self.assertEqual(count, len(env.list_templates(extensions=['html'])))
+        self.assertIn('partials/header.html', env.list_templates())
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), count)
+
+    def test_bytecode_cache_reused(self):
+        preload(self.environment(preload=True))
+
+        env = self.environment(preload=True)
+        with mock.patch.object(env, 'compile', wraps=env.compile) as compile_template:
+            preload(env)
+        compile_template.assert_not_called()
@@ -0,0 +1,271 @@
+import asyncio
+import socket
+from unittest.mock import MagicMock
+
+from aiohttp import BasicAuth, ClientSession
+from aiohttp.client_exceptions import ClientConnectionError, ClientResponseError
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import CallbackResult, aioresponses
+from yarl import URL
+
+from app.circuit_breaker import CircuitBreaker
+from app.upstream import ConnectionPoolStats, HedgePolicy, StaticResolver, UpstreamClient, parse_resolve
+from . import AsyncMock, RHTestCase
+
+
+class TestUpstreamClient(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upstream = UpstreamClient(self.app)
+        self.auth = self.app['COLLECTION_EXERCISE_AUTH']
+
+    @unittest_run_loop
+    async def test_get(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+
+            response = await self.upstream.get(self.collection_exercise_url, auth=self.auth)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(await response.json(), self.collection_exercise_json)
+        self.assertEqual(self.upstream.stats, {'requests': 1, 'coalesced': 0, 'in_flight': 0})
+
+    @unittest_run_loop
+    async def test_concurrent_gets_coalesced(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+
+            responses = await asyncio.gather(
+                *[self.upstream.get(self.collection_exercise_url, auth=self.auth) for _ in range(10)])
+
+        self.assertEqual(len(mocked.requests[('GET', URL(self.collection_exercise_url))]), 1)
+        for response in responses:
+            self.assertEqual(await response.json(), self.collection_exercise_json)
+        self.assertEqual(self.upstream.stats, {'requests': 1, 'coalesced': 9, 'in_flight': 0})
+
+    @unittest_run_loop
+    async def test_different_auth_not_coalesced(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json, repeat=True)
+
+            await asyncio.gather(self.upstream.get(self.collection_exercise_url, auth=self.auth),
+                                 self.upstream.get(self.collection_exercise_url, auth=BasicAuth('other', 'secret')))
+
+        self.assertEqual(len(mocked.requests[('GET', URL(self.collection_exercise_url))]), 2)
+        self.assertEqual(self.upstream.coalesced, 0)
+
+    @unittest_run_loop
+    async def test_sequential_gets_not_coalesced(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json, repeat=True)
+
+            await self.upstream.get(self.collection_exercise_url, auth=self.auth)
+            await self.upstream.get(self.collection_exercise_url, auth=self.auth)
+
+        self.assertEqual(self.upstream.stats, {'requests': 2, 'coalesced': 0, 'in_flight': 0})
+
+    @unittest_run_loop
+    async def test_error_status_shared(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, status=500)
+
+            responses = await asyncio.gather(
+                *[self.upstream.get(self.collection_exercise_url, auth=self.auth) for _ in range(2)])
+
+        for response in responses:
+            with self.assertRaises(ClientResponseError):
+                response.raise_for_status()
+
+    @unittest_run_loop
+    async def test_connection_error_shared(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, exception=ClientConnectionError('Failed'))
+
+            results = await asyncio.gather(
+                *[self.upstream.get(self.collection_exercise_url, auth=self.auth) for _ in range(2)],
+                return_exceptions=True)
+
+        for result in results:
+            self.assertIsInstance(result, ClientConnectionError)
+        self.assertEqual(self.upstream.stats['in_flight'], 0)
+
+    @unittest_run_loop
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+
+            first = asyncio.ensure_future(self.upstream.get(self.collection_exercise_url, auth=self.auth))
+            second = asyncio.ensure_future(self.upstream.get(self.collection_exercise_url, auth=self.auth))
+            await asyncio.sleep(0)
+            first.cancel()
+            response = await second
+
+        self.assertTrue(first.cancelled())
+        self.assertEqual(await response.json(), self.collection_exercise_json)
+
+
+class TestConnectionPools(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upstream = UpstreamClient(self.app, breakers=[
+            CircuitBreaker('case', self.app['CASE_URL'], failure_threshold=5, reset_timeout=30)
+        ], connector_options={'limit_per_host': 2})
+
+    async def tearDownAsync(self):
+        await self.upstream.stop(self.app)
+        await super().tearDownAsync()
+
+    def test_parse_resolve(self):
+        self.assertEqual(parse_resolve('case.internal:10.0.0.5, iac.internal:10.0.0.6'),
+                         {'case.internal': '10.0.0.5', 'iac.internal': '10.0.0.6'})
+        self.assertEqual(parse_resolve(''), {})
+
+    @unittest_run_loop
+    async def test_static_resolver(self):
+        fallback = MagicMock(resolve=AsyncMock(return_value=[{'host': '10.0.0.9'}]))
+        resolver = StaticResolver({'case.internal': '10.0.0.5'}, fallback)
+
+        hosts = await resolver.resolve('case.internal', 80)
+        self.assertEqual(hosts[0]['host'], '10.0.0.5')
+        self.assertEqual(hosts[0]['port'], 80)
+
+        hosts = await resolver.resolve('iac.internal', 80)
+        self.assertEqual(hosts, [{'host': '10.0.0.9'}])
+        fallback.resolve.assert_called_once_with('iac.internal', 80, family=socket.AF_INET)
+
+    @unittest_run_loop
+    async def test_session_for(self):
+        self.assertIs(self.upstream.session_for(self.case_url), self.app.http_session_pool)
+
+        await self.upstream.start(self.app)
+
+        session = self.upstream.session_for(self.case_url)
+        self.assertIsNot(session, self.app.http_session_pool)
+        self.assertEqual(session.connector.limit_per_host, 2)
+        self.assertIs(self.upstream.session_for('http://elsewhere/'), self.app.http_session_pool)
+
+    @unittest_run_loop
+    async def test_stop_closes_sessions(self):
+        await self.upstream.start(self.app)
+        session = self.upstream.sessions['case']
+
+        await self.upstream.stop(self.app)
+
+        self.assertTrue(session.closed)
+        self.assertEqual(self.upstream.sessions, {})
+
+    @unittest_run_loop
+    async def test_pool_stats(self):
+        pool = ConnectionPoolStats()
+        url = str(self.server.make_url('/info'))
+
+        async with ClientSession(trace_configs=[pool.trace_config()]) as session:
+            for _ in range(2):
+                async with session.get(url) as response:
+                    await response.read()
+
+        self.assertEqual(pool.stats['created'], 1)
+        self.assertEqual(pool.stats['reused'], 1)
+        self.assertEqual(pool.stats['reuse_ratio'], 0.5)
+
+
+class TestHedgePolicy(RHTestCase):
+
+    def test_delay(self):
+        hedge = HedgePolicy(percentile=95, max_rate=0.05, min_samples=20)
+        for n in range(19):
+            hedge.observe(n + 1)
+        self.assertIsNone(hedge.delay)
+
+        for n in range(19, 100):
+            hedge.observe(n + 1)
+        self.assertEqual(hedge.delay, 95)
+
+    def test_rate_capped(self):
+        hedge = HedgePolicy(percentile=95, max_rate=0.25)
+        allowed = 0
+        for _ in range(100):
+            hedge.request()
+            allowed += hedge.allow()
+
+        self.assertEqual(allowed, 25)
+        self.assertEqual(hedge.stats['hedged'], 25)
+
+
+class TestHedgedRequests(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.breaker = CircuitBreaker('collection_exercise', self.app['COLLECTION_EXERCISE_URL'],
+                                      failure_threshold=5, reset_timeout=30)
+        self.hedge = HedgePolicy(percentile=50, max_rate=1, min_samples=1)
+        self.hedge.observe(0.01)
+        self.upstream = UpstreamClient(self.app, breakers=[self.breaker], hedges={'collection_exercise': self.hedge})
+        self.auth = self.app['COLLECTION_EXERCISE_AUTH']
+        self.calls = 0
+        self.first_attempt_delay = 5
+
+    async def slow_first_attempt(self, url, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            await asyncio.sleep(self.first_attempt_delay)
+        return CallbackResult(payload=self.collection_exercise_json)
+
+    @unittest_run_loop
+    async def test_slow_request_hedged(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, callback=self.slow_first_attempt, repeat=True)
+
+            response = await asyncio.wait_for(self.upstream.get(self.collection_exercise_url, auth=self.auth), 1)
+
+        self.assertEqual(await response.json(), self.collection_exercise_json)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.hedge.hedged, 1)
+        self.assertEqual(self.hedge.wins, 1)
+
+    @unittest_run_loop
+    async def test_fast_request_not_hedged(self):
+        self.hedge.observe(1)
+        self.hedge.observe(1)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json, repeat=True)
+
+            await self.upstream.get(self.collection_exercise_url, auth=self.auth)
+
+        self.assertEqual(len(mocked.requests[('GET', URL(self.collection_exercise_url))]), 1)
+        self.assertEqual(self.hedge.hedged, 0)
+
+    @unittest_run_loop
+    async def test_failed_hedge_falls_back_to_first(self):
+        async def failing_hedge(url, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                await asyncio.sleep(0.1)
+                return CallbackResult(payload=self.collection_exercise_json)
+            raise ClientConnectionError('Failed')
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, callback=failing_hedge, repeat=True)
+
+            response = await self.upstream.get(self.collection_exercise_url, auth=self.auth)
+
+        self.assertEqual(await response.json(), self.collection_exercise_json)
+        self.assertEqual(self.hedge.stats['wins'], 0)
+
+    @unittest_run_loop
+    async def test_hedge_budget_exhausted(self):
+        self.hedge.max_rate = 0.5
+        self.first_attempt_delay = 0.3
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, callback=self.slow_first_attempt, repeat=True)
+
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.upstream.get(self.collection_exercise_url, auth=self.auth), 0.1)
+            await self.upstream.get(self.collection_exercise_url, auth=self.auth)  # shares the unhedged attempt
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.hedge.hedged, 0)
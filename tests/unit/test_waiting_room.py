@@ -0,0 +1,173 @@
+import re
+
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import aioresponses
+
+from app.waiting_room import WaitingRoom
+from . import AsyncMock, RHTestCase, skip_build_eq
+from .test_cache import FakeTimer
+
+
+class TestWaitingRoom(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.timer = FakeTimer()
+        self.timer.now = 1000.0
+        self.waiting_room = WaitingRoom(self.app, rate=2, refresh=5, timer=self.timer)
+
+    def schedule(self, slot):
+        self.app.redis_connection.eval = AsyncMock(return_value=str(slot).encode())
+
+    @unittest_run_loop
+    async def test_disabled(self):
+        self.waiting_room.rate = 0
+        self.schedule(1100.0)
+
+        self.assertIsNone(await self.waiting_room.ticket())
+        self.app.redis_connection.eval.assert_not_called()
+
+    @unittest_run_loop
+    async def test_admitted(self):
+        self.schedule(1000.5)
+
+        self.assertIsNone(await self.waiting_room.ticket())
+        self.assertEqual(self.app.redis_connection.eval.call_args[1]['args'][:2], ['1000.0', '0.5'])
+
+    @unittest_run_loop
+    async def test_queued(self):
+        self.schedule(1011.0)
+
+        slot = await self.waiting_room.ticket()
+
+        self.assertEqual(slot, 1011.0)
+        self.assertEqual(self.waiting_room.wait(slot), 10)
+        self.assertEqual(self.waiting_room.position(slot), 20)
+        self.assertEqual(self.waiting_room.refresh_after(slot), 5)
+        self.timer.now = 1008.5
+        self.assertEqual(self.waiting_room.refresh_after(slot), 2)
+        self.timer.now = 1010.0
+        self.assertEqual(self.waiting_room.wait(slot), 0)
+
+    @unittest_run_loop
+    async def test_redis_unavailable(self):
+        self.app.redis_connection.eval = AsyncMock(side_effect=ConnectionRefusedError)
+
+        with self.assertLogs('app.waiting_room', 'ERROR') as cm:
+            self.assertIsNone(await self.waiting_room.ticket())
+        self.assertLogLine(cm, 'Failed to schedule launch in waiting room')
+
+
+class TestWaitingRoomLaunch(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.timer = FakeTimer()
+        self.timer.now = 1000.0
+        self.app.waiting_room = WaitingRoom(self.app, rate=1, refresh=5, timer=self.timer)
+        self.app.redis_connection.eval = AsyncMock(return_value=b'1031.0')
+        self.get_waiting_room = self.app.router['WaitingRoom:get'].url_for()
+        self.post_waiting_room = self.app.router['WaitingRoom:post'].url_for()
+
+    @staticmethod
+    def session_cookie(response):
+        # NB: the client's cookie jar ignores cookies for the test server's IP address, so they are passed on by hand
+        morsel = response.cookies['AIOHTTP_SESSION']
+        return {'Cookie': f'{morsel.key}={morsel.value}'}
+
+    @skip_build_eq
+    @unittest_run_loop
+    async def test_queued_launch(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.iac_url, payload=self.iac_json)
+            mocked.get(self.case_url, payload=self.case_json)
+            mocked.post(self.case_events_url)
+
+            with self.assertLogs('respondent-home', 'INFO') as cm:
+                response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+            self.assertLogLine(cm, 'Launch queued in waiting room', wait=30.0)
+            self.assertEqual(response.status, 302)
+            self.assertEqual(response.headers['location'], str(self.get_waiting_room))
+            self.assertEqual(len(mocked.requests), 0)
+            headers = self.session_cookie(response)
+
+            response = await self.client.request("GET", self.get_waiting_room, allow_redirects=False, headers=headers)
+            self.assertEqual(response.status, 200)
+            contents = await response.text()
+            self.assertIn("You're in a queue", contents)
+            self.assertIn('<meta http-equiv="refresh" content="5">', contents)
+            self.assertIn('There are about 30 people ahead of you', contents)
+            self.assertEqual(len(mocked.requests), 0)
+
+            self.timer.now = 1030.0
+            response = await self.client.request("GET", self.get_waiting_room, allow_redirects=False, headers=headers)
+            self.assertEqual(response.status, 200)
+            contents = await response.text()
+            self.assertNotIn('http-equiv="refresh"', contents)
+            self.assertIn(f'action="{self.post_waiting_room}"', contents)
+            self.assertEqual(len(mocked.requests), 0)
+
+            with self.assertLogs('respondent-home', 'INFO') as cm:
+                response = await self.client.request("POST", self.post_waiting_room, allow_redirects=False,
+                                                     headers=headers, data={'ticket': self.ticket_id(contents)})
+            self.assertLogLine(cm, 'Launch admitted from waiting room')
+            self.assertLogLine(cm, 'Redirecting to eQ')
+            await self.app.case_events.flush()
+
+        self.assertEqual(response.status, 302)
+        self.assertIn(self.app['EQ_URL'], response.headers['location'])
+
+    async def queue_launch(self):
+        response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+        self.assertEqual(response.status, 302)
+        headers = self.session_cookie(response)
+        response = await self.client.request("GET", self.get_waiting_room, allow_redirects=False, headers=headers)
+        return headers, await response.text()
+
+    @staticmethod
+    def ticket_id(contents):
+        return re.search(r'name="ticket" value="(\w+)"', contents).group(1)
+
+    @unittest_run_loop
+    async def test_post_before_slot(self):
+        headers, contents = await self.queue_launch()
+        self.timer.now = 1030.0
+        contents = await (await self.client.request("GET", self.get_waiting_room, headers=headers)).text()
+        self.timer.now = 1020.0
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            response = await self.client.request("POST", self.post_waiting_room, allow_redirects=False,
+                                                 headers=headers, data={'ticket': self.ticket_id(contents)})
+            self.assertEqual(len(mocked.requests), 0)
+
+        self.assertEqual(response.status, 302)
+        self.assertEqual(response.headers['location'], str(self.get_waiting_room))
+
+    @unittest_run_loop
+    async def test_post_without_ticket(self):
+        headers, _ = await self.queue_launch()
+        self.timer.now = 1030.0
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            response = await self.client.request("POST", self.post_waiting_room, allow_redirects=False,
+                                                 headers=headers, data={'ticket': 'not-the-ticket'})
+            self.assertEqual(len(mocked.requests), 0)
+
+        self.assertEqual(response.status, 302)
+        self.assertEqual(response.headers['location'], str(self.get_index))
+
+    @unittest_run_loop
+    async def test_unknown_iac_not_queued(self):
+        self.app.unknown_iacs.contains = AsyncMock(return_value=True)
+
+        response = await self.client.request("POST", self.post_index, allow_redirects=False, data=self.form_data)
+
+        self.assertEqual(response.status, 202)
+        self.app.redis_connection.eval.assert_not_called()
+
+    @unittest_run_loop
+    async def test_no_ticket(self):
+        response = await self.client.request("GET", self.get_waiting_room, allow_redirects=False)
+
+        self.assertEqual(response.status, 302)
+        self.assertEqual(response.headers['location'], str(self.get_index))
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from aiohttp.test_utils import unittest_run_loop
+from aioresponses import aioresponses
+
+from app.warmup import CacheWarmer
+from . import AsyncMock, RHTestCase
+
+
+class TestCacheWarmer(RHTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app.reference_cache.redis_ttl = 0
+        self.warmer = CacheWarmer(self.app, [self.collection_exercise_id], timeout=1.0)
+
+    @unittest_run_loop
+    async def test_warm_configured_collection_exercises(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, payload=self.collection_exercise_events_json)
+
+            with self.assertLogs('app.warmup', 'INFO') as cm:
+                await self.warmer.warm()
+            self.assertLogLine(cm, 'Reference data cache warmed', documents=2, failed=0)
+
+        self.assertEqual(self.app.reference_cache.local.get(('collection_exercise', self.collection_exercise_id)),
+                         self.collection_exercise_json)
+        self.assertEqual(
+            self.app.reference_cache.local.get(('collection_exercise_events', self.collection_exercise_id)),
+            self.collection_exercise_events_json)
+        self.assertEqual(self.warmer.stats, {'done': False, 'documents': 2})
+
+    @unittest_run_loop
+    async def test_warm_upstream_error(self):
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            mocked.get(self.collection_exercise_url, payload=self.collection_exercise_json)
+            mocked.get(self.collection_exercise_events_url, status=500)
+
+            with self.assertLogs('app.warmup', 'WARNING') as cm:
+                await self.warmer.warm()
+            self.assertLogLine(cm, 'Failed to warm reference data',
+                               key=f'collection_exercise_events:{self.collection_exercise_id}')
+
+        self.assertEqual(self.warmer.documents, 1)
+
+    @unittest_run_loop
+    async def test_warm_discovered_documents(self):
+        self.app.reference_cache.redis_ttl = 900
+        redis_key = f'{self.app.reference_cache.key_prefix}:collection_instrument:{self.collection_instrument_id}'
+
+        async def iscan(match):
+            for key in (redis_key.encode(), f'{self.app.reference_cache.key_prefix}:unknown:1'.encode()):
+                yield key
+
+        self.app.redis_connection.iscan = iscan
+        self.app.redis_connection.get = AsyncMock(return_value=json.dumps(self.collection_instrument_json))
+        warmer = CacheWarmer(self.app, [], timeout=1.0)
+
+        with aioresponses(passthrough=[str(self.server._root)]) as mocked:
+            await warmer.warm()
+            self.assertEqual(len(mocked.requests), 0)
+
+        self.assertEqual(warmer.documents, 1)
+        self.assertEqual(self.app.reference_cache.local.get(('collection_instrument', self.collection_instrument_id)),
+                         self.collection_instrument_json)
+
+    @unittest_run_loop
+    async def test_warm_timeout(self):
+        self.warmer.timeout = 0.01
+
+        async def slow_warm():
+            await asyncio.sleep(1)
+
+        self.warmer.warm = slow_warm
+        with self.assertLogs('app.warmup', 'WARNING') as cm:
+            await self.warmer._run()
+        self.assertLogLine(cm, 'Timed out warming reference data cache')
+        self.assertTrue(self.warmer.done)
+
+    @unittest_run_loop
+    async def test_not_ready_until_warm(self):
+        await self.app.cache_warmer.stop(self.app)
+        self.app.cache_warmer.done = False
+        self.app.check_services = AsyncMock(return_value=True)
+
+        response = await self.client.request("GET", "/info?check=true")
+
+        self.assertEqual(response.status, 200)
+        json_response = await response.json()
+        self.assertFalse(json_response['ready'])
+        self.assertEqual(json_response['cache_warmup']['done'], False)